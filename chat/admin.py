@@ -1,16 +1,81 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db.models.functions import Substr
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
 from .models import Conversation, Message, GeneratedContent
 
 
-class GeneratedContentInline(admin.TabularInline):
-    model = GeneratedContent
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset that only renders one page of related rows."""
+    per_page = 25
+    page = 0
+    page_param = 'page'
+    query_params = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_page_queryset'):
+            queryset = super().get_queryset()
+            offset = self.page * self.per_page
+            self.total_count = queryset.count()
+            self._page_queryset = queryset[offset:offset + self.per_page]
+        return self._page_queryset
+
+    @property
+    def has_previous_page(self):
+        return self.page > 0
+
+    @property
+    def has_next_page(self):
+        self.get_queryset()
+        return (self.page + 1) * self.per_page < self.total_count
+
+    def _page_query(self, page):
+        # Keep the other inlines' pages and _changelist_filters in the link
+        params = self.query_params.copy() if self.query_params is not None else QueryDict(mutable=True)
+        params[self.page_param] = page
+        return params.urlencode()
+
+    @property
+    def previous_page_query(self):
+        return self._page_query(self.page - 1)
+
+    @property
+    def next_page_query(self):
+        return self._page_query(self.page + 1)
+
+
+class PaginatedInlineMixin:
+    """
+    Paginate a tabular inline via a ``?<model_name>_page=N`` GET parameter
+    so large conversations don't render every related row as a form.
+    """
+    per_page = 25
     extra = 0
+    formset = PaginatedInlineFormSet
+    template = 'admin/chat/edit_inline/paginated_tabular.html'
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        page_param = f'{self.model._meta.model_name}_page'
+        try:
+            page = max(int(request.GET.get(page_param, 0)), 0)
+        except ValueError:
+            page = 0
+        formset.per_page = self.per_page
+        formset.page = page
+        formset.page_param = page_param
+        formset.query_params = request.GET
+        return formset
+
+
+class GeneratedContentInline(PaginatedInlineMixin, admin.TabularInline):
+    model = GeneratedContent
     readonly_fields = ('id', 'created_at')
 
 
-class MessageInline(admin.TabularInline):
+class MessageInline(PaginatedInlineMixin, admin.TabularInline):
     model = Message
-    extra = 0
     readonly_fields = ('id', 'created_at')
     show_change_link = True
 
@@ -22,15 +87,34 @@ class ConversationAdmin(admin.ModelAdmin):
     inlines = [MessageInline]
 
 
+class MessageChangeList(ChangeList):
+    """Changelist that fetches an 81-char preview instead of the full content."""
+
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super().get_queryset(request, *args, **kwargs)
+        return queryset.annotate(preview=Substr('content', 1, 81)).defer('content')
+
+    def get_results(self, request):
+        super().get_results(request)
+        # Each row's checkbox label is str(message), which would load the
+        # deferred content one row at a time; the preview is enough for it
+        for message in self.result_list:
+            message.content = message.preview
+
+
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('role', 'content_preview', 'message_type', 'conversation', 'created_at')
     list_filter = ('role', 'message_type')
+    list_select_related = ('conversation',)
     search_fields = ('content',)
     inlines = [GeneratedContentInline]
 
+    def get_changelist(self, request, **kwargs):
+        return MessageChangeList
+
     def content_preview(self, obj):
-        return obj.content[:80] + '...' if len(obj.content) > 80 else obj.content
+        return obj.preview[:80] + '...' if len(obj.preview) > 80 else obj.preview
     content_preview.short_description = 'Content'
 
 
@@ -38,3 +122,4 @@ class MessageAdmin(admin.ModelAdmin):
 class GeneratedContentAdmin(admin.ModelAdmin):
     list_display = ('title', 'content_type', 'message', 'created_at')
     list_filter = ('content_type',)
+    list_select_related = ('message',)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the receivers)
+
+        # Build the Gemini client at startup so the first chat request
+        # doesn't pay for importing google-genai
+        from .services import get_genai_client
+        get_genai_client()
@@ -0,0 +1,41 @@
+"""
+JSON encoding for the API views.
+
+orjson is used when installed: it parses request bodies and serializes
+responses several times faster than the stdlib json + DjangoJSONEncoder
+path behind JsonResponse. Without it the stdlib is used, with the same
+output for the plain str/int/None/list/dict payloads the views return.
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(body):
+    """Parse a JSON request body. Raises json.JSONDecodeError if invalid."""
+    if orjson is None:
+        return json.loads(body)
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    return orjson.loads(body)
+
+
+def dumps(data):
+    """Serialize data to JSON bytes."""
+    if orjson is None:
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+    return orjson.dumps(data, default=str)
+
+
+class OrjsonResponse(HttpResponse):
+    """Drop-in for JsonResponse that serializes with orjson."""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(dumps(data), **kwargs)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-15 00:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_conversation_user'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-updated_at'], name='chat_conver_user_id_e2a76b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedcontent',
+            index=models.Index(fields=['message', 'created_at'], name='chat_genera_message_7056e8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedcontent',
+            index=models.Index(fields=['content_type'], name='chat_genera_content_2c0b57_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at'], name='chat_messag_convers_3154fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['role', 'message_type'], name='chat_messag_role_b51115_idx'),
+        ),
+    ]
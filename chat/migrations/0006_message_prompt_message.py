@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-15 01:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_message_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='prompt_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+    ]
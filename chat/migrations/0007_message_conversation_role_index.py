@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-15 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_message_prompt_message'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'role', 'created_at'], name='chat_messag_convers_e3d764_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-15 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_message_conversation_role_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
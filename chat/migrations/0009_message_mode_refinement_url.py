@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-15 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_message_queued_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='mode',
+            field=models.CharField(blank=True, choices=[('auto', 'Auto'), ('image', 'Image'), ('video', 'Video')], default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='refinement_url',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
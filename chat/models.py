@@ -24,11 +24,21 @@ class Conversation(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            # Per-user conversation list, newest first
+            models.Index(fields=['user', '-updated_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.id})"
 
 
+class MessageQuerySet(models.QuerySet):
+    def with_conversation(self):
+        """Join the parent conversation so `message.conversation` is free."""
+        return self.select_related('conversation')
+
+
 class Message(models.Model):
     """
     A single message in a conversation.
@@ -50,6 +60,16 @@ class Message(models.Model):
         ('story_sequence', 'Story Sequence'),
         ('mixed', 'Mixed Content'),
     ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    ]
+    MODE_CHOICES = [
+        ('auto', 'Auto'),
+        ('image', 'Image'),
+        ('video', 'Video'),
+    ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     conversation = models.ForeignKey(
@@ -60,12 +80,31 @@ class Message(models.Model):
     message_type = models.CharField(
         max_length=25, choices=MESSAGE_TYPE_CHOICES, default='text'
     )
+    # Assistant replies are 'pending' while generated in the background
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='complete')
+    # When the reply was last queued for (re)generation; see tasks.fail_if_stale
+    queued_at = models.DateTimeField(null=True, blank=True)
+    # For assistant replies: the user message being answered (regenerate reuses it)
+    prompt_message = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    # For user messages: how the reply was requested, so regenerate repeats it
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, blank=True, default='')
+    refinement_url = models.TextField(blank=True, default='')
     # Field to store user-uploaded images for editing/vision tasks
     image = models.ImageField(upload_to='uploads/%Y/%m/%d/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MessageQuerySet.as_manager()
+
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at']),
+            # A conversation's user messages in order (auto-title, regenerate fallback)
+            models.Index(fields=['conversation', 'role', 'created_at']),
+            models.Index(fields=['role', 'message_type']),
+        ]
 
     def __str__(self):
         return f"[{self.role}] {self.content[:50]}..."
@@ -106,6 +145,10 @@ class GeneratedContent(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['message', 'created_at']),
+            models.Index(fields=['content_type']),
+        ]
 
     def __str__(self):
         return f"{self.content_type}: {self.title or self.id}"
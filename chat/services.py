@@ -15,52 +15,211 @@ When not set, uses the mock keyword-based classifier with placeholder images.
 """
 
 import random
+import re
 import hashlib
+import concurrent.futures
+from functools import lru_cache, partial
 import logging
 import os
 import uuid
+import zlib
 import base64
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import io
 from PIL import Image, ImageDraw, ImageFont
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from django.conf import settings
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.db.models.functions import Substr
+from django.core.files.base import ContentFile, File
 from django.core.files.storage import default_storage
 
+from .models import GeneratedContent
+
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------
+# Shared HTTP session
+# ---------------------------------------------------------------------------
+# One pooled keep-alive session for every provider call, so repeated requests
+# to the same host reuse the TCP/TLS connection. Retries are limited to what
+# is safe to replay:
+# - a failed connect, for any method, since the request never got sent;
+# - read errors and 429/502/503/504 on idempotent requests (the GIF frame
+#   and mockup base downloads).
+# A 5xx/429 or read timeout on a paid generation POST may mean the job ran
+# upstream anyway; those fall through to the next provider instead.
+_HTTP = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=2,
+        connect=2,
+        read=2,
+        status=2,
+        other=0,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,  # excludes POST
+        backoff_factor=0.3,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    ),
+)
+_HTTP.mount('http://', _HTTP_ADAPTER)
+_HTTP.mount('https://', _HTTP_ADAPTER)
+
+
+def _json(response):
+    """
+    Decode a JSON response body. orjson parses the raw bytes directly,
+    which matters for the multi-MB base64 payloads from the Colab APIs.
+    """
+    if orjson is None:
+        return response.json()
+    return orjson.loads(response.content)
+
+
+@lru_cache(maxsize=1024)
+def _resolve_media_path(url):
+    """
+    Map a MEDIA_URL url to its file under MEDIA_ROOT. Returns None for
+    urls that aren't local media or that would escape MEDIA_ROOT. Only
+    string work, so it's memoised; callers still check the file exists.
+    """
+    if not url.startswith(settings.MEDIA_URL):
+        return None
+    media_root = Path(settings.MEDIA_ROOT)
+    path = Path(os.path.normpath(media_root / url[len(settings.MEDIA_URL):].lstrip('/')))
+    if not path.is_relative_to(media_root):
+        return None
+    return path
+
+
+IMAGE_SIGNATURES = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff')
+
+
+def _is_image_bytes(data):
+    """True if data starts with a PNG or JPEG signature."""
+    return data.startswith(IMAGE_SIGNATURES)
+
 # ---------------------------------------------------------------------------
 # Initialize Google GenAI Client
 # ---------------------------------------------------------------------------
 _client = None
+_client_unavailable = False
+_client_lock = threading.Lock()
+
 
 def get_genai_client():
-    global _client
-    if _client:
+    """
+    Return the process-wide Gemini client, creating it on first use.
+    A missing key or package is remembered so later calls return at once.
+    """
+    global _client, _client_unavailable
+    if _client is not None or _client_unavailable:
         return _client
-        
-    if not settings.GEMINI_API_KEY:
-        print("DEBUG: No GEMINI_API_KEY set. Using mock AI service.")
-        logger.info("No GEMINI_API_KEY set. Using mock AI service.")
-        return None
 
+    with _client_lock:
+        # Another thread may have finished initialising while we waited
+        if _client is not None or _client_unavailable:
+            return _client
+
+        if not settings.GEMINI_API_KEY:
+            logger.info("No GEMINI_API_KEY set. Using mock AI service.")
+            _client_unavailable = True
+            return None
+
+        try:
+            from google import genai
+            _client = genai.Client(api_key=settings.GEMINI_API_KEY)
+            logger.info("Google GenAI Client initialized successfully.")
+            return _client
+        except ImportError:
+            logger.warning("google-genai package not installed. Using mock AI service.")
+            _client_unavailable = True
+            return None
+        except Exception as e:
+            logger.error("Failed to initialize GenAI Client: %s", e)
+            return None
+
+
+# Preferred Gemini text model first, then the fallback. Once the preferred
+# model is unavailable we stick with the fallback instead of re-probing
+# every request.
+GEMINI_TEXT_MODELS = ('gemini-2.5-flash', 'gemini-flash-latest')
+_gemini_text_model = GEMINI_TEXT_MODELS[0]
+
+# API error codes meaning the model itself can't be used by this key.
+# Anything else (429, 5xx, timeouts) is transient and not worth a second call.
+MODEL_UNAVAILABLE_CODES = (403, 404)
+
+# Circuit breaker for transient errors: after this many consecutive
+# failures of the preferred model, use the fallback for a cooldown period
+GEMINI_BREAKER_THRESHOLD = 3
+GEMINI_BREAKER_COOLDOWN = 60  # seconds
+_gemini_failures = 0
+_gemini_preferred_retry_at = 0.0
+# Guards the model choice and breaker state above; the web threads, the
+# text executor and the generation workers all call Gemini concurrently
+_gemini_lock = threading.Lock()
+
+
+def _generate_gemini_content(client, contents, config=None):
+    """Call generate_content on the working Gemini text model."""
+    global _gemini_text_model, _gemini_failures, _gemini_preferred_retry_at
+    fallback = GEMINI_TEXT_MODELS[-1]
+    with _gemini_lock:
+        model_name = _gemini_text_model
+        if time.monotonic() < _gemini_preferred_retry_at:
+            model_name = fallback
     try:
-        from google import genai
-        _client = genai.Client(api_key=settings.GEMINI_API_KEY)
-        print("DEBUG: Google GenAI Client initialized successfully.")
-        logger.info("Google GenAI Client initialized successfully.")
-        return _client
-    except ImportError:
-        print("DEBUG: google-genai package not installed.")
-        logger.warning("google-genai package not installed. Using mock AI service.")
-        return None
+        response = client.models.generate_content(model=model_name, contents=contents, config=config)
     except Exception as e:
-        print(f"DEBUG: Failed to initialize GenAI Client: {e}")
-        logger.error(f"Failed to initialize GenAI Client: {e}")
-        return None
+        if model_name == fallback:
+            raise
+        if getattr(e, 'code', None) in MODEL_UNAVAILABLE_CODES:
+            logger.warning("Gemini model %s failed, switching to %s.", model_name, fallback)
+            with _gemini_lock:
+                _gemini_text_model = fallback
+            return client.models.generate_content(model=fallback, contents=contents, config=config)
+
+        tripped = False
+        with _gemini_lock:
+            # Calls already in flight when the breaker opened don't count again
+            if time.monotonic() >= _gemini_preferred_retry_at:
+                _gemini_failures += 1
+                if _gemini_failures >= GEMINI_BREAKER_THRESHOLD:
+                    tripped = True
+                    _gemini_failures = 0
+                    _gemini_preferred_retry_at = time.monotonic() + GEMINI_BREAKER_COOLDOWN
+        if tripped:
+            logger.warning(
+                "Gemini model %s failed %s times in a row, using %s for %ss.",
+                model_name, GEMINI_BREAKER_THRESHOLD, fallback, GEMINI_BREAKER_COOLDOWN,
+            )
+        raise
+
+    if model_name != fallback:
+        with _gemini_lock:
+            _gemini_failures = 0
+    return response
 
 
 # ---------------------------------------------------------------------------
@@ -107,12 +266,129 @@ INTENT_MAP = {
     ],
 }
 
-STYLES = [
+# Video and text keywords are more specific, so they score double
+WEIGHTED_INTENTS = ('video_loop', 'text_only')
+
+
+def _build_keyword_automaton():
+    """
+    Build one Aho-Corasick automaton over every INTENT_MAP keyword so the
+    fallback classifier scans the message once instead of once per keyword.
+    Returns None when pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+
+    keyword_intents = {}
+    for intent, keywords in INTENT_MAP.items():
+        weight = 2 if intent in WEIGHTED_INTENTS else 1
+        for kw in keywords:
+            keyword_intents.setdefault(kw, []).append((intent, weight))
+
+    automaton = ahocorasick.Automaton()
+    for kw, hits in keyword_intents.items():
+        automaton.add_word(kw, (kw, tuple(hits)))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+# (intent, weight, patterns) rows for the scan used without pyahocorasick
+_WEIGHTED_KEYWORDS = tuple(
+    (intent, 2 if intent in WEIGHTED_INTENTS else 1,
+     tuple(re.compile(r'\b' + re.escape(kw)) for kw in keywords))
+    for intent, keywords in INTENT_MAP.items()
+)
+
+
+def _starts_word(text, index):
+    return index == 0 or not text[index - 1].isalnum()
+
+
+def _score_intents(text_lower):
+    """
+    Weighted keyword scores per intent. Each keyword counts once and must
+    start at a word boundary, so 'sign' doesn't fire inside 'design' while
+    'painting' still counts for 'paint'.
+    """
+    if _KEYWORD_AUTOMATON is None:
+        scores = {}
+        for intent, weight, patterns in _WEIGHTED_KEYWORDS:
+            hits = sum(1 for pattern in patterns if pattern.search(text_lower))
+            if hits:
+                scores[intent] = hits * weight
+        return scores
+
+    totals = {}
+    matched = {
+        value for end, value in _KEYWORD_AUTOMATON.iter(text_lower)
+        if _starts_word(text_lower, end - len(value[0]) + 1)
+    }
+    for _, hits in matched:
+        for intent, weight in hits:
+            totals[intent] = totals.get(intent, 0) + weight
+
+    # Keep INTENT_MAP order so ties resolve the same way as before
+    return {intent: totals[intent] for intent in INTENT_MAP if intent in totals}
+
+
+STYLES = (
     'ethereal', 'vibrant', 'moody', 'minimalist', 'surrealist',
     'impressionist', 'photorealistic', 'watercolor', 'oil painting',
     'digital art', 'abstract', 'cinematic', 'dreamy', 'bold',
     'vintage', 'futuristic', 'noir', 'pastel', 'geometric',
-]
+)
+
+# Intent -> GeneratedContent.content_type for generated items
+CONTENT_TYPE_MAP = {
+    'image_generation': 'artwork',
+    'image_transformation': 'photo',
+    'poster_design': 'poster',
+    'vision_board': 'vision_board',
+    'brand_artwork': 'brand_asset',
+    'story_sequence': 'artwork',
+    'video_loop': 'video', # Special case
+}
+
+# Intent -> (aspect ratio, prompt suffix) for real image generation
+DEFAULT_IMAGE_FORMAT = ('1:1', "")
+INTENT_IMAGE_FORMAT = {
+    'poster_design': ('3:4', ", poster design, typography, graphic design"),
+    'brand_artwork': ('16:9', ", logo, vector art, minimal, professional branding"),
+    'video_loop': ('16:9', ", cinematic shot, movie scene, keyframe, detailed 8k"),
+    'vision_board': ('1:1', ", moodboard, collage, grid layout, aesthetic"),
+}
+APPLE_BRAND_SUFFIX = ", apple-style, minimalist, sleek, white background, premium lighting"
+
+# Mock video loops fall back to still placeholder artwork
+MOCK_CONTENT_TYPE_MAP = {**CONTENT_TYPE_MAP, 'video_loop': 'artwork'}
+
+
+# Static part of the Gemini classification prompt; only the message varies
+INTENT_PROMPT_PREAMBLE = """Analyze the following user message and classify the intent into ONE of these categories:
+- image_generation (user wants to see/create/generate an image, painting, drawing)
+- image_transformation (user wants to edit/transform an existing image)
+- poster_design (user wants a poster, sign, flyer)
+- vision_board (user wants a moodboard, collage, vision board)
+- brand_artwork (user wants logos, branding, marketing visuals)
+- story_sequence (user wants a storyboard, scene-by-scene visualization)
+- video_loop (user wants an animation concept, video loop, movie, clip)
+- product_mockup (user wants to place a design on a product like t-shirt, mug, phone case)
+- text_only (user just wants to chat, ask questions, write text, no visuals needed)
+
+"""
+
+# Constrain the classifier's reply to exactly one intent label
+INTENT_RESPONSE_CONFIG = {
+    'response_mime_type': 'text/x.enum',
+    'response_schema': {'type': 'STRING', 'enum': list(INTENT_MAP)},
+    'temperature': 0,
+}
+
+# Keyword score at which classify_intent trusts the keywords over Gemini,
+# provided the runner-up scores less than half as much
+KEYWORD_SHORTCUT_SCORE = 3
 
 
 def classify_intent(message_text):
@@ -120,66 +396,40 @@ def classify_intent(message_text):
     Classify user intent using Gemini (if available) or fallback to keywords.
     Returns: (intent_type, confidence)
     """
-    # 1. Try Gemini Classification if available
+    scores = _score_intents(message_text.lower())
+    logger.debug("Intent Scores for '%s': %s", message_text, scores)
+
+    # 1. A clear keyword winner needs no Gemini round-trip
+    ranked = sorted(scores.values(), reverse=True)
+    if ranked and ranked[0] >= KEYWORD_SHORTCUT_SCORE:
+        runner_up = ranked[1] if len(ranked) > 1 else 0
+        if runner_up * 2 < ranked[0]:
+            return max(scores, key=scores.get), 0.9
+
+    # 2. Try Gemini Classification if available
     client = get_genai_client()
     if client:
+        # Case and whitespace don't change the intent, so normalise the key
+        normalized = ' '.join(message_text.lower().split())
+        cache_key = 'intent:' + hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+        cached = cache.get(cache_key)
+        if cached:
+            return tuple(cached)
         try:
-            prompt = f"""
-            Analyze the following user message and classify the intent into ONE of these categories:
-            - image_generation (user wants to see/create/generate an image, painting, drawing)
-            - image_transformation (user wants to edit/transform an existing image)
-            - poster_design (user wants a poster, sign, flyer)
-            - vision_board (user wants a moodboard, collage, vision board)
-            - brand_artwork (user wants logos, branding, marketing visuals)
-            - story_sequence (user wants a storyboard, scene-by-scene visualization)
-            - video_loop (user wants an animation concept, video loop, movie, clip)
-            - product_mockup (user wants to place a design on a product like t-shirt, mug, phone case)
-            - text_only (user just wants to chat, ask questions, write text, no visuals needed)
-
-            User Message: "{message_text}"
-
-            Respond ONLY with the category name.
-            """
-            
-            # Try 2.5-flash first, fallback to flash-latest
-            model_name = 'gemini-2.5-flash'
-            try:
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=prompt
-                )
-            except Exception:
-                model_name = 'gemini-flash-latest'
-                response = client.models.generate_content(
-                    model=model_name,
-                    contents=prompt
-                )
+            prompt = f'{INTENT_PROMPT_PREAMBLE}User Message: "{message_text}"\n\nRespond ONLY with the category name.'
+            response = _generate_gemini_content(client, prompt, INTENT_RESPONSE_CONFIG)
 
             intent = response.text.strip().lower()
-            
+
             # validated intent
-            valid_intents = list(INTENT_MAP.keys()) + ['text_only']
-            if intent in valid_intents:
+            if intent in INTENT_MAP:
+                cache.set(cache_key, (intent, 0.95), settings.CACHE_TTL_INTENT)
                 return intent, 0.95
                 
         except Exception as e:
-            print(f"DEBUG: Gemini classification failed: {e}")
-            logger.warning(f"Gemini classification failed: {e}. Falling back to keywords.")
-
-    # 2. Fallback to Keyword Matching
-    text_lower = message_text.lower()
-    scores = {}
-
-    for intent, keywords in INTENT_MAP.items():
-        # Weighted scoring: Video and Text keywords are more specific, so give them higher weight
-        weight = 2 if intent in ['video_loop', 'text_only'] else 1
-        score = sum(weight for kw in keywords if kw in text_lower)
-        
-        if score > 0:
-            scores[intent] = score
-
-    print(f"DEBUG: Intent Scores for '{message_text}': {scores}")
+            logger.warning("Gemini classification failed: %s. Falling back to keywords.", e)
 
+    # 3. Fallback to Keyword Matching
     if not scores:
         return 'text_only', 0.5
     
@@ -216,23 +466,26 @@ def _generate_nvidia_text(prompt, system_prompt, history=None):
             "max_tokens": 1024
         }
         
-        print(f"DEBUG: Requesting NVIDIA Text: {prompt[:50]}... (history: {len(history) if history else 0} msgs)")
-        response = requests.post(url, headers=headers, json=payload, timeout=30)
+        logger.debug("Requesting NVIDIA Text: %s... (history: %s msgs)", prompt[:50], len(history) if history else 0)
+        response = _HTTP.post(url, headers=headers, json=payload, timeout=30)
         
         if response.status_code == 200:
-            data = response.json()
+            data = _json(response)
             return data['choices'][0]['message']['content']
         else:
-            print(f"DEBUG: NVIDIA Text Error: {response.status_code} - {response.text}")
+            logger.error("NVIDIA Text Error: %s - %s", response.status_code, response.text)
             return None
 
     except Exception as e:
-        print(f"DEBUG: NVIDIA Text Exception: {e}")
+        logger.error("NVIDIA Text Exception: %s", e)
         return None
 
 
-def _generate_nvidia_image(prompt):
-    """Generate image using NVIDIA NIM (Stable Diffusion XL)."""
+def _generate_nvidia_image(prompt, cancel=None):
+    """
+    Generate image using NVIDIA NIM (Stable Diffusion XL). Nothing is saved
+    if `cancel` (a threading.Event) is set by the time the image arrives.
+    """
     if not settings.NVIDIA_API_KEY:
         return None
 
@@ -251,30 +504,35 @@ def _generate_nvidia_image(prompt):
             "steps": 25
         }
         
-        print(f"DEBUG: Requesting NVIDIA Image: {prompt[:50]}...")
-        response = requests.post(url, headers=headers, json=payload, timeout=60)
+        logger.debug("Requesting NVIDIA Image: %s...", prompt[:50])
+        response = _HTTP.post(url, headers=headers, json=payload, timeout=60)
         
         if response.status_code == 200:
-            data = response.json()
+            data = _json(response)
             # SDXL NIM might return base64
             artifacts = data.get('artifacts', [])
             if artifacts:
                 image_b64 = artifacts[0].get('base64')
                 if image_b64:
                     image_bytes = base64.b64decode(image_b64)
+                    if not _is_image_bytes(image_bytes):
+                        logger.warning("NVIDIA Image returned non-image data")
+                        return None
+                    if cancel is not None and cancel.is_set():
+                        return None
                     filename = f"generated/nvidia_{uuid.uuid4()}.png"
                     image_content = ContentFile(image_bytes)
                     saved_path = default_storage.save(filename, image_content)
                     return default_storage.url(saved_path)
             
-            print(f"DEBUG: NVIDIA Image Response malformed: {data.keys()}")
+            logger.warning("NVIDIA Image Response malformed: %s", data.keys())
             return None
         else:
-            print(f"DEBUG: NVIDIA Image Error: {response.status_code} - {response.text}")
+            logger.error("NVIDIA Image Error: %s - %s", response.status_code, response.text)
             return None
 
     except Exception as e:
-        print(f"DEBUG: NVIDIA Image Exception: {e}")
+        logger.error("NVIDIA Image Exception: %s", e)
         return None
 
 
@@ -282,29 +540,80 @@ def _generate_nvidia_image(prompt):
 # ---------------------------------------------------------------------------
 # Colab Self-Hosted InstructPix2Pix (Image Editing via ngrok API)
 # ---------------------------------------------------------------------------
-def _generate_colab_img2img(prompt, image_file):
+def _prepare_image_b64(image_file, max_dim=1024):
+    """
+    Shrink an uploaded image to fit max_dim and return it as base64 JPEG
+    (a fraction of the PNG size for photos, and the image is RGB anyway).
+    PIL reads straight from the file so the upload is never copied to bytes.
+    JPEGs are decoded at reduced scale via draft() so large photos never
+    get fully decoded just to be thrown away by the resize.
+    """
+    image_file.seek(0)
+    img = Image.open(image_file)
+    img.draft('RGB', (max_dim, max_dim))
+    img = img.convert("RGB")
+    img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+
+    buffered = io.BytesIO()
+    img.save(buffered, format="JPEG", quality=92)
+    return base64.b64encode(buffered.getbuffer()).decode('ascii')
+
+
+COLAB_EDIT_PARAMS = {"steps": 20, "guidance": 7.5, "image_guidance": 1.5}
+
+
+def _image_digest(image_file):
+    """sha256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in image_file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _colab_edit_cache_key(prompt, image_digest):
+    """Content-addressed key for an edit: same image, prompt and params."""
+    digest = hashlib.sha256(image_digest.encode())
+    digest.update(prompt.encode())
+    digest.update(repr(sorted(COLAB_EDIT_PARAMS.items())).encode())
+    return 'colab_edit:' + digest.hexdigest()
+
+
+@lru_cache(maxsize=32)
+def _prepared_media_image(path, mtime_ns):
+    """
+    Digest and Colab-ready base64 of a file under MEDIA_ROOT.
+    Users tend to refine the same generated image several times in a row;
+    keyed on mtime so a replaced file is read again.
+    """
+    with open(path, 'rb') as fh:
+        image_file = File(fh)
+        return _image_digest(image_file), _prepare_image_b64(image_file)
+
+
+def _generate_colab_img2img(prompt, image_file=None, prepared=None):
     """
     Edit image using self-hosted InstructPix2Pix on Google Colab.
     Requires COLAB_API_URL and COLAB_API_KEY in settings.
+    Pass either an image file or a (digest, base64) pair from
+    _prepared_media_image.
     Returns: URL to the saved edited image, or None.
     """
     if not settings.COLAB_API_URL or not settings.COLAB_API_KEY:
-        print("DEBUG: Colab API not configured — skipping")
+        logger.debug("Colab API not configured — skipping")
         return None
 
     try:
-        print(f"DEBUG: Colab InstructPix2Pix — Processing base image...")
+        logger.debug("Colab InstructPix2Pix — Processing base image...")
 
-        # Read and resize input image
-        image_data = image_file.read()
-        img = Image.open(io.BytesIO(image_data))
-        img = img.convert("RGB")
-        img.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+        image_digest, img_b64 = prepared or (_image_digest(image_file), None)
+        cache_key = _colab_edit_cache_key(prompt, image_digest)
+        cached_url = cache.get(cache_key)
+        if cached_url:
+            logger.debug("Colab InstructPix2Pix — cache hit: %s", cached_url)
+            return cached_url
 
-        # Convert to base64
-        buffered = io.BytesIO()
-        img.save(buffered, format="PNG")
-        img_b64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
+        if img_b64 is None:
+            img_b64 = _prepare_image_b64(image_file)
 
         api_url = f"{settings.COLAB_API_URL.rstrip('/')}/edit"
         headers = {
@@ -312,46 +621,39 @@ def _generate_colab_img2img(prompt, image_file):
             "Content-Type": "application/json",
         }
 
-        payload = {
-            "image_b64": img_b64,
-            "prompt": prompt,
-            "steps": 20,
-            "guidance": 7.5,
-            "image_guidance": 1.5,
-        }
+        payload = {"image_b64": img_b64, "prompt": prompt, **COLAB_EDIT_PARAMS}
 
-        print(f"DEBUG: Colab InstructPix2Pix — Requesting edit: {prompt[:50]}...")
-        response = requests.post(api_url, headers=headers, json=payload, timeout=120)
+        logger.debug("Colab InstructPix2Pix — Requesting edit: %s...", prompt[:50])
+        response = _HTTP.post(api_url, headers=headers, json=payload, timeout=120)
 
         if response.status_code == 200:
-            data = response.json()
+            data = _json(response)
             if data.get("status") == "success" and data.get("image_b64"):
                 image_bytes = base64.b64decode(data["image_b64"])
-                if image_bytes:
+                if _is_image_bytes(image_bytes):
                     filename = f"generated/colab_edit_{uuid.uuid4()}.png"
                     image_content = ContentFile(image_bytes)
                     saved_path = default_storage.save(filename, image_content)
                     result_url = default_storage.url(saved_path)
                     elapsed = data.get("elapsed_seconds", "?")
-                    print(f"DEBUG: Colab InstructPix2Pix — edit complete: {result_url} ({elapsed}s)")
+                    logger.debug("Colab InstructPix2Pix — edit complete: %s (%ss)", result_url, elapsed)
+                    cache.set(cache_key, result_url, settings.CACHE_TTL_GENERATED)
                     return result_url
 
-            print(f"DEBUG: Colab InstructPix2Pix — Unexpected response: {data.get('error', 'unknown')}")
+            logger.error("Colab InstructPix2Pix — Unexpected response: %s", data.get('error', 'unknown'))
             return None
         else:
-            print(f"DEBUG: Colab InstructPix2Pix Error: {response.status_code} - {response.text[:300]}")
+            logger.error("Colab InstructPix2Pix Error: %s - %s", response.status_code, response.text[:300])
             return None
 
     except requests.exceptions.Timeout:
-        print("DEBUG: Colab InstructPix2Pix — Request timed out (120s)")
+        logger.warning("Colab InstructPix2Pix — Request timed out (120s)")
         return None
     except requests.exceptions.ConnectionError:
-        print("DEBUG: Colab InstructPix2Pix — Connection failed (Colab may be offline)")
+        logger.warning("Colab InstructPix2Pix — Connection failed (Colab may be offline)")
         return None
     except Exception as e:
-        print(f"DEBUG: Colab InstructPix2Pix Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Colab InstructPix2Pix Exception: %s", e)
         return None
 
 
@@ -365,7 +667,7 @@ def _generate_colab_video(prompt):
     Returns: URL to the saved GIF/video file, or None.
     """
     if not settings.COLAB_VIDEO_API_URL or not settings.COLAB_VIDEO_API_KEY:
-        print("DEBUG: Colab Video API not configured — skipping")
+        logger.debug("Colab Video API not configured — skipping")
         return None
 
     try:
@@ -384,11 +686,11 @@ def _generate_colab_video(prompt):
             "output_format": "gif",
         }
 
-        print(f"DEBUG: Colab AnimateDiff — Generating video: {prompt[:50]}...")
-        response = requests.post(api_url, headers=headers, json=payload, timeout=180)
+        logger.debug("Colab AnimateDiff — Generating video: %s...", prompt[:50])
+        response = _HTTP.post(api_url, headers=headers, json=payload, timeout=180)
 
         if response.status_code == 200:
-            data = response.json()
+            data = _json(response)
             if data.get("status") == "success" and data.get("video_b64"):
                 video_bytes = base64.b64decode(data["video_b64"])
                 if video_bytes:
@@ -397,30 +699,79 @@ def _generate_colab_video(prompt):
                     saved_path = default_storage.save(filename, ContentFile(video_bytes))
                     result_url = default_storage.url(saved_path)
                     elapsed = data.get("elapsed_seconds", "?")
-                    print(f"DEBUG: Colab AnimateDiff — video complete: {result_url} ({elapsed}s)")
+                    logger.debug("Colab AnimateDiff — video complete: %s (%ss)", result_url, elapsed)
                     return result_url
 
-            print(f"DEBUG: Colab AnimateDiff — Unexpected response: {data.get('error', 'unknown')}")
+            logger.error("Colab AnimateDiff — Unexpected response: %s", data.get('error', 'unknown'))
             return None
         else:
-            print(f"DEBUG: Colab AnimateDiff Error: {response.status_code} - {response.text[:300]}")
+            logger.error("Colab AnimateDiff Error: %s - %s", response.status_code, response.text[:300])
             return None
 
     except requests.exceptions.Timeout:
-        print("DEBUG: Colab AnimateDiff — Request timed out (180s)")
+        logger.warning("Colab AnimateDiff — Request timed out (180s)")
         return None
     except requests.exceptions.ConnectionError:
-        print("DEBUG: Colab AnimateDiff — Connection failed (Colab may be offline)")
+        logger.warning("Colab AnimateDiff — Connection failed (Colab may be offline)")
         return None
     except Exception as e:
-        print(f"DEBUG: Colab AnimateDiff Exception: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Colab AnimateDiff Exception: %s", e)
         return None
 
 # ---------------------------------------------------------------------------
 # Product Mockup (Composite Approach)
 # ---------------------------------------------------------------------------
+# Alpha lookup table that fades the mockup overlay to 85% opacity
+_OVERLAY_ALPHA_LUT = [int(p * 0.85) for p in range(256)]
+
+
+# Generated blank product photos, reused across mockups (under MEDIA_ROOT)
+MOCKUP_BASE_DIR = Path('mockups') / 'bases'
+
+
+def _load_mockup_base(product_type, base_prompt):
+    """
+    Return a blank product image for base_prompt as RGB, or None.
+
+    Bases are cached on disk keyed by a hash of the prompt, so editing a
+    prompt never serves photos generated from the old one. Each prompt has
+    MOCKUP_BASE_POOL_SIZE slots picked at random, keeping some variety
+    between mockups; a slot that is empty or older than MOCKUP_BASE_TTL is
+    (re)generated when picked.
+    """
+    prompt_key = hashlib.sha1(base_prompt.encode('utf-8')).hexdigest()[:12]
+    slot = random.randrange(max(settings.MOCKUP_BASE_POOL_SIZE, 1))
+    cached_path = (
+        Path(settings.MEDIA_ROOT) / MOCKUP_BASE_DIR
+        / f"{product_type.replace(' ', '-')}-{prompt_key}-{slot}.png"
+    )
+    try:
+        if time.time() - cached_path.stat().st_mtime < settings.MOCKUP_BASE_TTL:
+            return Image.open(cached_path).convert('RGB')
+    except FileNotFoundError:
+        pass
+
+    base_url = _generate_nvidia_image(base_prompt) if settings.NVIDIA_API_KEY else None
+    if not base_url:
+        return None
+
+    base_path = _resolve_media_path(base_url)
+    if base_path:
+        base_img = Image.open(base_path).convert('RGB')
+    else:
+        with _HTTP.get(base_url, timeout=15, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            base_img = Image.open(response.raw).convert('RGB')
+
+    # Write then rename so a concurrent mockup never reads a partial file
+    cached_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached_path.with_name(f"{cached_path.stem}_{uuid.uuid4().hex[:8]}.tmp")
+    base_img.save(tmp_path, format='PNG')
+    os.replace(tmp_path, cached_path)
+    return base_img
+
+
 def _generate_product_mockup(prompt, image_file):
     """
     Generate a product mockup by creating a base product image
@@ -450,72 +801,72 @@ def _generate_product_mockup(prompt, image_file):
             base_prompt = 'a blank white t-shirt on a flat surface, studio lighting, product photography'
             overlay_area = (0.25, 0.20, 0.75, 0.65)
 
-        print(f"DEBUG: Product mockup — type={product_type}")
+        logger.debug("Product mockup — type=%s", product_type)
 
-        # 2. Generate base product image
-        base_url = None
-        if settings.NVIDIA_API_KEY:
-            base_url = _generate_nvidia_image(base_prompt)
-        if not base_url:
-            print("DEBUG: Could not generate base product image")
+        # 2-3. Blank product image (generated once per product type)
+        base_img = _load_mockup_base(product_type, base_prompt)
+        if base_img is None:
+            logger.warning("Could not generate base product image")
             return None
 
-        # 3. Download base image
-        import urllib.request
-        if base_url.startswith('/media/'):
-            base_path = Path(settings.MEDIA_ROOT) / base_url.replace('/media/', '')
-            base_img = Image.open(base_path).convert('RGBA')
-        else:
-            req = urllib.request.urlopen(base_url, timeout=15)
-            base_img = Image.open(io.BytesIO(req.read())).convert('RGBA')
-
-        # 4. Load overlay (user's uploaded image)
-        image_file.seek(0)
-        overlay_img = Image.open(image_file).convert('RGBA')
-
-        # 5. Calculate overlay position
+        # 4. Calculate overlay position
         bw, bh = base_img.size
         ox1, oy1, ox2, oy2 = overlay_area
         target_w = int(bw * (ox2 - ox1))
         target_h = int(bh * (oy2 - oy1))
 
-        # Resize overlay to fit target area, maintaining aspect ratio
+        # 5. Load overlay (user's uploaded image) and resize it to fit the
+        # target area, maintaining aspect ratio. Resizing before the RGBA
+        # conversion lets JPEGs decode at reduced scale and converts fewer
+        # pixels; palette images convert first as they only resize NEAREST.
+        image_file.seek(0)
+        overlay_img = Image.open(image_file)
+        if overlay_img.mode in ('1', 'P'):
+            overlay_img = overlay_img.convert('RGBA')
         overlay_img.thumbnail((target_w, target_h), Image.LANCZOS)
+        if overlay_img.mode != 'RGBA':
+            overlay_img = overlay_img.convert('RGBA')
         ow, oh = overlay_img.size
 
         # Center within the target area
         paste_x = int(bw * ox1) + (target_w - ow) // 2
         paste_y = int(bh * oy1) + (target_h - oh) // 2
 
-        # 6. Composite
-        composite = base_img.copy()
+        # 6. Composite (base_img is our own decoded copy, so paste in place)
         # Reduce overlay opacity slightly for realism
-        overlay_with_alpha = overlay_img.copy()
-        alpha = overlay_with_alpha.split()[3]
-        alpha = alpha.point(lambda p: int(p * 0.85))
-        overlay_with_alpha.putalpha(alpha)
-        composite.paste(overlay_with_alpha, (paste_x, paste_y), overlay_with_alpha)
-
-        # 7. Save
-        composite_rgb = composite.convert('RGB')
+        overlay_img.putalpha(overlay_img.getchannel('A').point(_OVERLAY_ALPHA_LUT))
+        base_img.paste(overlay_img, (paste_x, paste_y), overlay_img)
+
+        # 7. Save (base_img is already RGB, so it encodes as JPEG directly)
         buffer = io.BytesIO()
-        composite_rgb.save(buffer, format='JPEG', quality=90)
-        buffer.seek(0)
+        base_img.save(buffer, format='JPEG', quality=85, optimize=True)
 
         filename = f"mockups/mockup_{uuid.uuid4().hex[:8]}.jpg"
-        saved_path = default_storage.save(filename, ContentFile(buffer.read()))
+        saved_path = default_storage.save(filename, File(buffer))
         url = f"{settings.MEDIA_URL}{saved_path}"
-        print(f"DEBUG: Product mockup saved: {url}")
+        logger.debug("Product mockup saved: %s", url)
         return url
 
     except Exception as e:
-        print(f"DEBUG: Product mockup error: {e}")
+        logger.error("Product mockup error: %s", e)
         return None
 
 
 # ---------------------------------------------------------------------------
 # Context & Memory Management
 # ---------------------------------------------------------------------------
+# Specific styles we want to remember across a conversation
+STYLE_KEYWORDS = (
+    'minimalist', 'cyberpunk', 'watercolor', 'noir', 'vintage',
+    'abstract', 'photorealistic', '3d render', 'flat design',
+    'apple-esque', 'premium', 'dark mode', 'pastel',
+)
+# Single pass over the message; like intent keywords, a style must start a word
+_STYLE_KEYWORD_RE = re.compile(
+    r'\b(' + '|'.join(map(re.escape, sorted(STYLE_KEYWORDS, key=len, reverse=True))) + ')'
+)
+
+
 def _update_user_context(conversation, message_text, intent):
     """
     Extract preference/style keywords from the message and update conversation context.
@@ -523,26 +874,20 @@ def _update_user_context(conversation, message_text, intent):
     if not conversation:
         return
 
-    # specific styles we want to remember
-    interesting_keywords = [
-        'minimalist', 'cyberpunk', 'watercolor', 'noir', 'vintage', 
-        'abstract', 'photorealistic', '3d render', 'flat design',
-        'apple-esque', 'premium', 'dark mode', 'pastel'
-    ]
-    
-    found_styles = [kw for kw in interesting_keywords if kw in message_text.lower()]
+    found_styles = set(_STYLE_KEYWORD_RE.findall(message_text.lower()))
     
     if found_styles:
         current_context = conversation.user_context or {}
         # Update 'preferred_styles'
         existing_styles = current_context.get('preferred_styles', [])
+        if found_styles.issubset(existing_styles):
+            return  # nothing new, skip the write
+
         # Add new styles
-        updated_styles = list(set(existing_styles + found_styles))
-        current_context['preferred_styles'] = updated_styles
-        
+        current_context['preferred_styles'] = sorted(found_styles.union(existing_styles))
         conversation.user_context = current_context
-        conversation.save()
-        print(f"DEBUG: Updated User Context: {current_context}")
+        conversation.save(update_fields=['user_context'])
+        logger.debug("Updated User Context: %s", current_context)
 
 
 def _get_context_prompt(conversation):
@@ -562,54 +907,73 @@ def _get_context_prompt(conversation):
 # ---------------------------------------------------------------------------
 
 
+def _fetch_gif_frame(url):
+    """Load one frame from local media or a remote URL. Returns None on failure."""
+    try:
+        path = _resolve_media_path(url)
+        if path:
+            if not path.exists():
+                return None
+            img = Image.open(path)
+        elif url.startswith('http'):
+            resp = _HTTP.get(url, timeout=10)
+            if resp.status_code != 200:
+                return None
+            img = Image.open(io.BytesIO(resp.content))
+        else:
+            return None
+        # Decode here so it overlaps with the other frames' downloads
+        img.load()
+        return img
+    except Exception:
+        return None
+
+
+def _quantize_shared_palette(frames):
+    """
+    Quantize same-sized frames to one 255-colour palette. The frames are
+    tiled side by side and quantized once, so the GIF carries a single
+    global colour table instead of a per-frame one.
+    """
+    width, height = frames[0].size
+    strip = Image.new('RGB', (width * len(frames), height))
+    for i, frame in enumerate(frames):
+        strip.paste(frame, (i * width, 0))
+
+    strip = strip.quantize(colors=255, dither=Image.Dither.FLOYDSTEINBERG)
+    return [strip.crop((i * width, 0, (i + 1) * width, height)) for i in range(len(frames))]
+
+
 def _create_gif_from_images(image_urls, fps=2):
     """
     Download images from URLs and stitch them into a GIF.
     Returns the URL of the generated GIF.
     """
     try:
-        frames = []
-        
-        for url in image_urls:
-            # Handle local or remote URLs
-            if url.startswith('/media/'):
-                # Local file
-                 # Ensure MEDIA_ROOT is a Path object or string
-                 media_root = Path(settings.MEDIA_ROOT)
-                 rel_path = url.replace('/media/', '').lstrip('/')
-                 path = media_root / rel_path
-                 
-                 if path.exists():
-                     try:
-                         img = Image.open(path)
-                         frames.append(img)
-                     except Exception:
-                         pass
-
-            elif url.startswith('http'):
-                # Download remote image
-                try:
-                    resp = requests.get(url, timeout=10)
-                    if resp.status_code == 200:
-                        img = Image.open(io.BytesIO(resp.content))
-                        frames.append(img)
-                except Exception:
-                    pass
+        # Frames are fetched concurrently; map() keeps them in order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(image_urls), 8)) as executor:
+            frames = [img for img in executor.map(_fetch_gif_frame, image_urls) if img]
 
         if not frames:
             return None
 
-        # Resize to match first frame
+        # Resize to match first frame; same-size frames (the usual case,
+        # one provider and aspect ratio) are used as-is
+        frames = [f if f.mode == 'RGB' else f.convert('RGB') for f in frames]
         base_size = frames[0].size
-        resized_frames = [f.resize(base_size) for f in frames]
+        resized_frames = [
+            f if f.size == base_size else f.resize(base_size, Image.Resampling.LANCZOS)
+            for f in frames
+        ]
+        palette_frames = _quantize_shared_palette(resized_frames)
 
         # Save GIF
         blob = io.BytesIO()
-        resized_frames[0].save(
+        palette_frames[0].save(
             blob, 
             format='GIF', 
             save_all=True, 
-            append_images=resized_frames[1:], 
+            append_images=palette_frames[1:], 
             duration=500, # 500ms per frame
             loop=0
         )
@@ -620,13 +984,8 @@ def _create_gif_from_images(image_urls, fps=2):
         final_url = default_storage.url(saved_path)
         return final_url
 
-    except Exception:
-        # Silently fail or log if needed, but for now we just return None
-        return None
-        print(f"DEBUG: GIF Generation failed: {e}")
-        logger.error(f"GIF Generation failed: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception as e:
+        logger.error("GIF Generation failed: %s", e)
         return None
 
 
@@ -665,41 +1024,59 @@ def _generate_gemini_response(message_text, intent, context_prompt="", history=N
     # Build conversation context from history
     history_text = ""
     if history:
-        history_text = "\n\nConversation history:\n"
-        for msg in history[-8:]:  # Last 8 messages max
-            role_label = "User" if msg['role'] == 'user' else "Assistant"
-            history_text += f"{role_label}: {msg['content'][:200]}\n"
-        history_text += "---\n"
+        lines = [
+            f"{'User' if msg['role'] == 'user' else 'Assistant'}: {msg['content'][:200]}"
+            for msg in history[-8:]  # Last 8 messages max
+        ]
+        history_text = "\n\nConversation history:\n" + "\n".join(lines) + "\n---\n"
     
     full_prompt = f"{system_prompt}\n\n{context_prompt}{history_text}\n\nUser request: {message_text}"
 
     try:
-        # Try 2.5 first
-        model_name = 'gemini-2.5-flash'
-        try:
-            response = client.models.generate_content(
-                model=model_name,
-                contents=full_prompt
-            )
-            return response.text
-        except Exception:
-             # Fallback
-             model_name = 'gemini-flash-latest'
-             response = client.models.generate_content(
-                model=model_name,
-                contents=full_prompt
-            )
-             return response.text
+        response = _generate_gemini_content(client, full_prompt)
+        return response.text
 
     except Exception as e:
-        print(f"DEBUG: Gemini Text API error: {e}")
-        logger.error(f"Gemini Text API error: {e}")
+        logger.error("Gemini Text API error: %s", e)
         return None
 
 
 # ---------------------------------------------------------------------------
 # Hugging Face Image Generation (Fallback)
 # ---------------------------------------------------------------------------
+def _save_streamed_response(response, filename):
+    """
+    Pipe a streamed (stream=True) response body straight into storage,
+    which reads it in chunks, so the full image never sits in memory and
+    isn't spooled to a temp file first. Returns the saved storage path.
+    """
+    response.raw.decode_content = True
+    return default_storage.save(filename, File(response.raw))
+
+
+# Longest we'll wait (seconds) for a cold Hugging Face model before one retry
+HF_LOADING_MAX_WAIT = 20
+
+
+def _hf_loading_wait(response):
+    """
+    Seconds to wait before retrying a 503 that says the model is still
+    loading, or None for any other 503. Nothing was generated for such a
+    response, so repeating the POST can't double-bill.
+    """
+    try:
+        data = _json(response)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or 'loading' not in str(data.get('error', '')).lower():
+        return None
+    try:
+        estimated = float(data.get('estimated_time') or HF_LOADING_MAX_WAIT)
+    except (TypeError, ValueError):
+        estimated = HF_LOADING_MAX_WAIT
+    return min(max(estimated, 1), HF_LOADING_MAX_WAIT)
+
+
 def _generate_huggingface_image(prompt):
     """Generate image using Hugging Face Inference API (Stable Diffusion XL)."""
     if not settings.HUGGINGFACE_API_KEY:
@@ -709,40 +1086,73 @@ def _generate_huggingface_image(prompt):
     headers = {"Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}"}
 
     try:
-        print(f"DEBUG: Requesting Hugging Face Image: {prompt[:50]}...")
-        response = requests.post(api_url, headers=headers, json={"inputs": prompt}, timeout=90)
-        
-        if response.status_code == 200:
-            image_bytes = response.content
-            filename = f"generated/{uuid.uuid4()}.png"
-            image_content = ContentFile(image_bytes)
-            saved_path = default_storage.save(filename, image_content)
-            return default_storage.url(saved_path)
-        else:
-            print(f"DEBUG: Hugging Face Error: {response.status_code} - {response.text}")
-            logger.error(f"Hugging Face Error: {response.status_code} - {response.text}")
-            return None
+        for attempt in range(2):
+            logger.debug("Requesting Hugging Face Image: %s...", prompt[:50])
+            with _HTTP.post(api_url, headers=headers, json={"inputs": prompt}, timeout=90, stream=True) as response:
+                if response.status_code == 503 and attempt == 0:
+                    wait = _hf_loading_wait(response)
+                    if wait is not None:
+                        logger.info("Hugging Face model is loading; retrying in %.0fs", wait)
+                        time.sleep(wait)
+                        continue
+                if response.status_code == 200:
+                    # Error bodies can come back as JSON with a 200
+                    if not response.headers.get('Content-Type', '').startswith('image/'):
+                        logger.error("Hugging Face returned %s, not an image", response.headers.get('Content-Type'))
+                        return None
+                    filename = f"generated/{uuid.uuid4()}.png"
+                    saved_path = _save_streamed_response(response, filename)
+                    return default_storage.url(saved_path)
+                else:
+                    logger.error("Hugging Face Error: %s - %s", response.status_code, response.text)
+                    return None
 
     except Exception as e:
-        print(f"DEBUG: Hugging Face Exception: {e}")
-        logger.error(f"Hugging Face Exception: {e}")
+        logger.error("Hugging Face Exception: %s", e)
         return None
 
 
 # ---------------------------------------------------------------------------
 # Imagen Image Generation
 # ---------------------------------------------------------------------------
-def _generate_imagen_images_batch(prompt, count=1, aspect_ratio='1:1'):
+def _save_imagen_image(img_obj, cancel=None):
+    """
+    Persist one Imagen result to storage. Returns its URL, or None if there
+    was nothing to save or `cancel` (a threading.Event) has been set.
+    """
+    if cancel is not None and cancel.is_set():
+        return None
+    filename = f"generated/{uuid.uuid4()}.png"
+
+    # Prefer the encoded bytes Google already sent; only re-encode
+    # when the SDK hands back a bare image object.
+    image_content = None
+    image = getattr(img_obj, 'image', None)
+    image_bytes = getattr(image, 'image_bytes', None) or getattr(img_obj, 'image_bytes', None)
+    if image_bytes:
+        image_content = ContentFile(image_bytes)
+    elif image:
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        image_content = ContentFile(buffer.getvalue())
+
+    if not image_content:
+        return None
+    saved_path = default_storage.save(filename, image_content)
+    return default_storage.url(saved_path)
+
+
+def _generate_imagen_images_batch(prompt, count=1, aspect_ratio='1:1', cancel=None):
     """
     Generate multiple images using Google Imagen 3 via google-genai SDK.
-    Returns a list of local URLs.
+    Returns a list of local URLs; see _save_imagen_image for `cancel`.
     """
     client = get_genai_client()
     if not client:
         return []
 
     try:
-        print(f"DEBUG: Generating {count} images with Imagen 3...")
+        logger.debug("Generating %s images with Imagen 3...", count)
         # Config for image generation
         # Use standard Imagen 3.0 model
         from google.genai import types 
@@ -761,36 +1171,110 @@ def _generate_imagen_images_batch(prompt, count=1, aspect_ratio='1:1'):
         )
 
         if not response.generated_images:
-            print("DEBUG: Imagen returned no images.")
             logger.error("Imagen returned no images.")
             return []
 
-        saved_urls = []
-        for img_obj in response.generated_images:
-            filename = f"generated/{uuid.uuid4()}.png"
-            
-            image_content = None
-            if hasattr(img_obj, 'image') and img_obj.image:
-                 image = img_obj.image
-                 from io import BytesIO
-                 buffer = BytesIO()
-                 image.save(buffer, format="PNG")
-                 image_content = ContentFile(buffer.getvalue())
-            elif hasattr(img_obj, 'image_bytes'):
-                 image_content = ContentFile(img_obj.image_bytes)
-            
-            if image_content:
-                saved_path = default_storage.save(filename, image_content)
-                saved_urls.append(default_storage.url(saved_path))
-        
+        images = response.generated_images
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(images), 4)) as executor:
+            save = partial(_save_imagen_image, cancel=cancel)
+            saved_urls = [url for url in executor.map(save, images) if url]
+
         return saved_urls
 
     except Exception as e:
         # Fallback handling
-        print(f"DEBUG: Imagen API error: {e}")
-        logger.error(f"Imagen API error: {e}")
+        logger.error("Imagen API error: %s", e)
+        return []
+
+
+
+def _generate_nvidia_images_batch(prompts, cancel=None):
+    """Generate one NVIDIA NIM image per prompt concurrently."""
+    logger.debug("Generating %s images with NVIDIA NIM (concurrent)...", len(prompts))
+    generate = partial(_generate_nvidia_image, cancel=cancel)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        return [url for url in executor.map(generate, prompts) if url]
+
+
+def _nvidia_image_provider(prompt, prompt_variations, aspect_ratio, cancel=None):
+    return _generate_nvidia_images_batch(prompt_variations, cancel=cancel)
+
+
+def _imagen_image_provider(prompt, prompt_variations, aspect_ratio, cancel=None):
+    return _generate_imagen_images_batch(
+        prompt, count=len(prompt_variations), aspect_ratio=aspect_ratio, cancel=cancel
+    )
+
+
+# Image providers in priority order: (name, is_configured, generate).
+# Each generate takes (prompt, prompt_variations, aspect_ratio, cancel) and
+# returns a list of image URLs, saving nothing once `cancel` is set.
+IMAGE_PROVIDERS = [
+    ('nvidia', lambda: bool(settings.NVIDIA_API_KEY), _nvidia_image_provider),
+    ('imagen', lambda: get_genai_client() is not None, _imagen_image_provider),
+]
+
+# Shared by every race so a hedge doesn't spin up a pool per request. Losing
+# providers keep their slot until their HTTP call returns, hence the headroom.
+_hedge_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=2 * settings.GENERATION_WORKERS * len(IMAGE_PROVIDERS),
+    thread_name_prefix='vizzy-hedge',
+)
+
+
+def _race_image_providers(providers, hedge_delay=None):
+    """
+    Run image providers in priority order as a staggered hedge: the next
+    provider starts early if the current ones haven't answered within
+    hedge_delay seconds (default settings.IMAGE_HEDGE_DELAY), or at once if
+    they came back empty. Each provider is called with a shared `cancel`
+    event, set once a winner is found so losers don't save their images.
+    Returns the first non-empty list of URLs, or [] if every provider failed;
+    a provider that raises counts as failed and the others keep running.
+
+    A hedge_delay of 0 disables hedging: providers run one after another
+    and only the ones actually needed are called (and billed).
+    """
+    if hedge_delay is None:
+        hedge_delay = settings.IMAGE_HEDGE_DELAY
+    cancel = threading.Event()
+
+    if hedge_delay <= 0:
+        for provider in providers:
+            try:
+                urls = provider(cancel=cancel)
+            except Exception:
+                logger.exception("Image provider failed")
+                continue
+            if urls:
+                return urls
         return []
 
+    pending = set()
+    try:
+        for i, provider in enumerate(providers):
+            pending.add(_hedge_executor.submit(provider, cancel=cancel))
+            timeout = None if i == len(providers) - 1 else hedge_delay
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    logger.debug("Image provider slow after %ss, starting the next one", hedge_delay)
+                    break
+                for future in done:
+                    try:
+                        urls = future.result()
+                    except Exception:
+                        logger.exception("Image provider failed")
+                        continue
+                    if urls:
+                        return urls
+        return []
+    finally:
+        # Don't wait on a slower provider that lost the race; just tell it
+        # not to save anything when it does finish
+        cancel.set()
 
 
 def _generate_real_content_items(intent, message_text, conversation=None, image_file=None):
@@ -805,7 +1289,7 @@ def _generate_real_content_items(intent, message_text, conversation=None, image_
 
     # Handle Image Editing (Transformation)
     if intent == 'image_transformation' and image_file:
-         print("DEBUG: Processing Image Transformation using HuggingFace Edit...")
+         logger.debug("Processing Image Transformation using HuggingFace Edit...")
          
          image_file.seek(0)
          edited_url = _edit_huggingface_image(image_file, message_text)
@@ -819,7 +1303,7 @@ def _generate_real_content_items(intent, message_text, conversation=None, image_
                  'prompt_used': message_text,
              }]
          else:
-             print("DEBUG: Image editing/transformation failed.")
+             logger.warning("Image editing/transformation failed.")
              pass
 
     if intent == 'text_only':
@@ -830,61 +1314,32 @@ def _generate_real_content_items(intent, message_text, conversation=None, image_
     count = 4
     
     # Determine aspect ratio details
-    aspect_ratio = '1:1'
-    keyword_suffix = ""
-    
-    if intent == 'poster_design':
-        aspect_ratio = '3:4'
-        keyword_suffix = ", poster design, typography, graphic design"
-    elif intent == 'brand_artwork':
-        aspect_ratio = '16:9'
-        keyword_suffix = ", logo, vector art, minimal, professional branding"
-        if "apple" in message_text.lower():
-            keyword_suffix += ", apple-style, minimalist, sleek, white background, premium lighting"
-    elif intent == 'video_loop':
-        aspect_ratio = '16:9'
-        keyword_suffix = ", cinematic shot, movie scene, keyframe, detailed 8k"
-    elif intent == 'vision_board':
-        aspect_ratio = '1:1' # or 3:4
-        keyword_suffix = ", moodboard, collage, grid layout, aesthetic"
-
-    content_type_map = {
-        'image_generation': 'artwork',
-        'image_transformation': 'photo',
-        'poster_design': 'poster',
-        'vision_board': 'vision_board',
-        'brand_artwork': 'brand_asset',
-        'story_sequence': 'artwork',
-        'video_loop': 'video', # Special case
-    }
-    content_type = content_type_map.get(intent, 'image')
+    aspect_ratio, keyword_suffix = INTENT_IMAGE_FORMAT.get(intent, DEFAULT_IMAGE_FORMAT)
+    if intent == 'brand_artwork' and "apple" in message_text.lower():
+        keyword_suffix += APPLE_BRAND_SUFFIX
+
+    content_type = CONTENT_TYPE_MAP.get(intent, 'image')
 
     # Batch generation
     style = random.choice(STYLES)
     enhanced_prompt = f"{message_text}, {style} style{context_style}{keyword_suffix}, high quality, detailed"
+    # Per-image prompts, shared by every provider that makes one call per image
+    prompt_variations = [f"{enhanced_prompt}, variation {i+1}" for i in range(count)]
     
     image_urls = []
 
-    # Priority: NVIDIA NIM -> Google Imagen -> Hugging Face -> Pollinations
-    if settings.NVIDIA_API_KEY:
-         print(f"DEBUG: Generating {count} images with NVIDIA NIM (concurrent)...")
-         import concurrent.futures
-         with concurrent.futures.ThreadPoolExecutor(max_workers=count) as executor:
-             futures = []
-             for i in range(count):
-                 prompt_var = enhanced_prompt + f" variation {i+1}"
-                 futures.append(executor.submit(_generate_nvidia_image, prompt_var))
-             for future in concurrent.futures.as_completed(futures):
-                 url = future.result()
-                 if url:
-                     image_urls.append(url)
-    
-    if not image_urls:
-        image_urls = _generate_imagen_images_batch(enhanced_prompt, count=count, aspect_ratio=aspect_ratio)
+    # Priority: IMAGE_PROVIDERS (NVIDIA NIM -> Google Imagen) -> Hugging Face
+    providers = [
+        partial(generate, enhanced_prompt, prompt_variations, aspect_ratio)
+        for name, is_configured, generate in IMAGE_PROVIDERS
+        if is_configured()
+    ]
+    if providers:
+        image_urls = _race_image_providers(providers)
 
     # GIF Creation for Video Loop
     if intent == 'video_loop' and len(image_urls) >= 2:
-        print("DEBUG: Generating GIF for video loop...")
+        logger.debug("Generating GIF for video loop...")
         gif_url = _create_gif_from_images(image_urls)
         if gif_url:
             # Return the GIF as the main item, maybe others as frames?
@@ -899,32 +1354,32 @@ def _generate_real_content_items(intent, message_text, conversation=None, image_
 
     # Fallback to HF if no images from Imagen
     if not image_urls and settings.HUGGINGFACE_API_KEY:
-        print("DEBUG: Google Imagen failed/unavailable. Falling back to Hugging Face...")
-        for i in range(2): # limit fallback to 2
-             prompt_var = enhanced_prompt + f", variation {i+1}"
-             url = _generate_huggingface_image(prompt_var)
-             if url:
-                 image_urls.append(url)
+        logger.warning("Google Imagen failed/unavailable. Falling back to Hugging Face...")
+        prompts = prompt_variations[:2] # limit fallback to 2
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+            for url in executor.map(_generate_huggingface_image, prompts):
+                if url:
+                    image_urls.append(url)
 
 
-    items = []
-    for url in image_urls:
-         items.append({
-                'content_type': content_type,
-                'title': f"{content_type.title()} — {style.title()}",
-                'description': f"Generated with AI.",
-                'image_url': url,
-                'prompt_used': enhanced_prompt,
-            })
-    
-    return items
+    title = f"{content_type.title()} — {style.title()}"
+    return [
+        {
+            'content_type': content_type,
+            'title': title,
+            'description': "Generated with AI.",
+            'image_url': url,
+            'prompt_used': enhanced_prompt,
+        }
+        for url in image_urls
+    ]
 
 
 # ---------------------------------------------------------------------------
 # Mock Generation (Fallback)
 # ---------------------------------------------------------------------------
 def _generate_seed(text):
-    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    return zlib.crc32(text.encode())
 
 def _get_placeholder_url(seed, width=800, height=600):
     img_id = (seed % 1000) + 1
@@ -937,16 +1392,7 @@ def _generate_mock_content_items(intent, message_text, count=4):
 
     seed = _generate_seed(message_text + str(datetime.now().timestamp()))
 
-    content_type_map = {
-        'image_generation': 'artwork',
-        'image_transformation': 'photo',
-        'poster_design': 'poster',
-        'vision_board': 'vision_board',
-        'brand_artwork': 'brand_asset',
-        'story_sequence': 'artwork',
-        'video_loop': 'artwork',
-    }
-    content_type = content_type_map.get(intent, 'image')
+    content_type = MOCK_CONTENT_TYPE_MAP.get(intent, 'image')
 
     items = []
     
@@ -963,7 +1409,7 @@ def _generate_mock_content_items(intent, message_text, count=4):
 
     # Handle Video Loop specifically for Mock
     if intent == 'video_loop':
-        print("DEBUG: Generating Mock GIFs for video loop...")
+        logger.debug("Generating Mock GIFs for video loop...")
         video_items = []
         for i in range(count):
              # Generate a unique sequence for each video variant
@@ -1023,6 +1469,52 @@ def _build_mock_response_text(intent, message_text, content_count):
     return base_response
 
 
+# ---------------------------------------------------------------------------
+# Text Response
+# ---------------------------------------------------------------------------
+# Text responses run alongside image generation on this shared pool
+_TEXT_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix='vizzy-text'
+)
+
+
+def _load_chat_history(conversation):
+    """Return the last 10 messages of a conversation as role/content dicts."""
+    if not conversation:
+        return None
+    try:
+        # Only role and the first 300 chars are needed; values() skips
+        # building models and Substr keeps long replies in the database
+        recent_msgs = list(
+            conversation.messages.exclude(status='pending')
+            .order_by('-created_at')
+            .annotate(excerpt=Substr('content', 1, 300))
+            .values('role', 'excerpt')[:10]
+        )
+        return [
+            {
+                'role': 'user' if m['role'] == 'user' else 'assistant',
+                'content': m['excerpt']
+            }
+            for m in reversed(recent_msgs)
+        ]
+    except Exception as e:
+        logger.warning("Could not load history: %s", e)
+        return None
+
+
+def _generate_text_response(client, intent, text_prompt, context_prompt, chat_history):
+    """Generate the assistant's reply text. Priority: NVIDIA -> Gemini."""
+    response_text = None
+    if settings.NVIDIA_API_KEY:
+        system_prompt = GEMINI_SYSTEM_PROMPT if intent != 'text_only' else TEXT_ONLY_SYSTEM_PROMPT
+        response_text = _generate_nvidia_text(text_prompt, system_prompt, history=chat_history)
+
+    if not response_text and client:
+        response_text = _generate_gemini_response(text_prompt, intent, context_prompt, history=chat_history)
+    return response_text
+
+
 # ---------------------------------------------------------------------------
 # Main Entry Point
 # ---------------------------------------------------------------------------
@@ -1036,6 +1528,9 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
         image_file (File): Uploaded image
         mode (str): 'image', 'video' or None (auto)
         refinement_url (str): URL of a previously generated image to refine
+
+    Returns a dict with 'response_text', 'message_type' and 'content_items';
+    save the items with persist_content_items().
     """
     
     # 0. Determine Intent
@@ -1054,11 +1549,14 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
     elif is_short_followup and conversation:
         # Look at the last assistant message to determine what to continue
         try:
-            last_assistant = conversation.messages.filter(role='assistant').order_by('-created_at').first()
+            last_assistant = (
+                conversation.messages.filter(role='assistant')
+                .exclude(status='pending').order_by('-created_at').first()
+            )
             if last_assistant and last_assistant.message_type != 'text':
                 intent = last_assistant.message_type
                 confidence = 0.9
-                print(f"DEBUG: Short follow-up detected — reusing last intent: {intent}")
+                logger.debug("Short follow-up detected — reusing last intent: %s", intent)
             else:
                 intent = 'text_only'
                 confidence = 0.85
@@ -1079,7 +1577,7 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
     else:
         intent, confidence = classify_intent(message_text)
     
-    print(f"DEBUG: Intent detected: {intent} (Mode: {mode}, Refinement: {bool(refinement_url)}, ShortFollowup: {is_short_followup})")
+    logger.debug("Intent detected: %s (Mode: %s, Refinement: %s, ShortFollowup: %s)", intent, mode, bool(refinement_url), is_short_followup)
 
     # 1. Update Context
     if conversation:
@@ -1088,36 +1586,35 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
     content_items = []
     response_text = None
 
-    # 2. Generate Content
+    # 2. Start the text response in the background; it doesn't depend on
+    # the generated images, so both network round-trips overlap.
     client = get_genai_client()
-    
+    text_future = None
+    if client or settings.NVIDIA_API_KEY:
+        text_prompt = message_text
+        if image_file:
+            text_prompt = f"[User uploaded an image for editing] {message_text}"
+        # History and context are read here so no ORM access happens off-thread
+        text_future = _TEXT_EXECUTOR.submit(
+            _generate_text_response, client, intent, text_prompt,
+            _get_context_prompt(conversation), _load_chat_history(conversation),
+        )
+
+    # 3. Generate Content
     # [REFINEMENT] User selected a previously generated image and wants to modify it
     if intent == 'refinement' and refinement_url:
-        print(f"DEBUG: Refinement mode — downloading selected image from {refinement_url}")
+        logger.debug("Refinement mode — downloading selected image from %s", refinement_url)
         try:
             # Download the selected image from local media storage
-            from pathlib import Path
-            from django.core.files.uploadedfile import SimpleUploadedFile
-            
-            rel_path = refinement_url.replace(settings.MEDIA_URL, '').lstrip('/')
-            media_root = Path(settings.MEDIA_ROOT)
-            file_path = media_root / rel_path
-            
-            if file_path.exists():
-                with open(file_path, 'rb') as f:
-                    image_data = f.read()
-                
-                # Create a file-like object for the img2img function
-                fake_file = SimpleUploadedFile(
-                    name=file_path.name,
-                    content=image_data,
-                    content_type='image/png'
-                )
-                
-                # Use Colab InstructPix2Pix for refinement
+            file_path = _resolve_media_path(refinement_url)
+
+            if file_path and file_path.exists():
+                # Use Colab InstructPix2Pix for refinement. The prepared
+                # image is reused across refinements of the same file.
                 if not content_items and settings.COLAB_API_URL:
-                    print(f"DEBUG: Refining with Colab InstructPix2Pix...")
-                    img_url = _generate_colab_img2img(message_text, fake_file)
+                    logger.debug("Refining with Colab InstructPix2Pix...")
+                    prepared = _prepared_media_image(str(file_path), file_path.stat().st_mtime_ns)
+                    img_url = _generate_colab_img2img(message_text, prepared=prepared)
                     if img_url:
                         content_items.append({
                             'content_type': 'image_generation',
@@ -1128,9 +1625,9 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
                         })
                 
             else:
-                print(f"DEBUG: Refinement image not found at {file_path}")
+                logger.warning("Refinement image not found at %s", file_path)
         except Exception as e:
-            print(f"DEBUG: Refinement error: {e}")
+            logger.error("Refinement error: %s", e)
     
     # [VIDEO GENERATION — Colab AnimateDiff]
     elif intent == 'video_loop':
@@ -1138,7 +1635,7 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
 
         # Colab AnimateDiff (self-hosted, free)
         if settings.COLAB_VIDEO_API_URL:
-            print(f"DEBUG: Generating Video with Colab AnimateDiff...")
+            logger.debug("Generating Video with Colab AnimateDiff...")
             video_url = _generate_colab_video(message_text)
 
         if video_url:
@@ -1152,7 +1649,7 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
     
      # [IMAGE TRANSFORMATION — Colab InstructPix2Pix]
     elif intent == 'image_transformation' and image_file:
-         print(f"DEBUG: Transforming Image with Colab InstructPix2Pix...")
+         logger.debug("Transforming Image with Colab InstructPix2Pix...")
          img_url = None
          
          # Use Colab InstructPix2Pix
@@ -1170,7 +1667,7 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
 
     # [PRODUCT MOCKUP] Composite: generate base product + overlay uploaded design
     elif intent == 'product_mockup' and image_file:
-        print(f"DEBUG: Creating product mockup...")
+        logger.debug("Creating product mockup...")
         mockup_url = _generate_product_mockup(message_text, image_file)
         if mockup_url:
             content_items.append({
@@ -1188,36 +1685,9 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
     if not content_items and intent != 'text_only':
         content_items = _generate_mock_content_items(intent, message_text)
     
-    # 3. Generate Text Response
-    # Build conversation history for context
-    chat_history = None
-    if conversation:
-        try:
-            recent_msgs = conversation.messages.order_by('-created_at')[:10]
-            chat_history = []
-            for m in reversed(list(recent_msgs)):
-                chat_history.append({
-                    'role': 'user' if m.role == 'user' else 'assistant',
-                    'content': m.content[:300]
-                })
-        except Exception as e:
-            print(f"DEBUG: Could not load history: {e}")
-    
-    if client or settings.NVIDIA_API_KEY:
-        text_prompt = message_text
-        if image_file:
-            text_prompt = f"[User uploaded an image for editing] {message_text}"
-        
-        context_prompt = _get_context_prompt(conversation)
-        
-        # Priority: NVIDIA -> Gemini -> Mock
-        if settings.NVIDIA_API_KEY:
-            system_prompt = GEMINI_SYSTEM_PROMPT if intent != 'text_only' else TEXT_ONLY_SYSTEM_PROMPT
-            response_text = _generate_nvidia_text(text_prompt, system_prompt, history=chat_history)
+    if text_future:
+        response_text = text_future.result()
 
-        if not response_text and client:
-            response_text = _generate_gemini_response(text_prompt, intent, context_prompt, history=chat_history)
-    
     if not response_text:
         response_text = _build_mock_response_text(intent, message_text, len(content_items))
 
@@ -1228,3 +1698,20 @@ def generate_response(message_text, conversation=None, image_file=None, mode=Non
         'content_items': content_items,
         'message_type': intent,
     }
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+CONTENT_ITEM_FIELDS = ('content_type', 'title', 'description', 'image_url', 'prompt_used')
+
+
+def persist_content_items(message, items):
+    """
+    Save generate_response()'s content_items for `message` in one INSERT.
+    Returns the created GeneratedContent objects.
+    """
+    return GeneratedContent.objects.bulk_create([
+        GeneratedContent(message=message, **{field: item[field] for field in CONTENT_ITEM_FIELDS})
+        for item in items
+    ])
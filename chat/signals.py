@@ -0,0 +1,37 @@
+"""
+Cache invalidation for the sidebar conversation list.
+
+conversation_list caches each user's serialized list. Anything that changes
+it (a conversation created, renamed, touched or deleted, or a message added)
+drops that user's entry once the change has committed.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Conversation, Message
+
+
+def conversation_list_cache_key(user_id):
+    return f'conversation_list:{user_id}'
+
+
+def invalidate_conversation_list(user_id):
+    """Drop user_id's cached list once the current transaction commits."""
+    if user_id is not None:
+        transaction.on_commit(lambda: cache.delete(conversation_list_cache_key(user_id)))
+
+
+@receiver(post_save, sender=Conversation)
+@receiver(post_delete, sender=Conversation)
+def conversation_changed(sender, instance, **kwargs):
+    invalidate_conversation_list(instance.user_id)
+
+
+# Message deletes only happen through the conversation cascade, which the
+# Conversation post_delete already covers.
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, **kwargs):
+    invalidate_conversation_list(instance.conversation.user_id)
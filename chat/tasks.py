@@ -0,0 +1,125 @@
+"""
+Background AI generation.
+
+Generating a reply can take a minute or more, so send_message and
+regenerate_message mark the assistant message pending and hand the work
+to a small thread pool. The client polls the message until its status
+leaves 'pending'.
+
+The pool is in-process, so a worker recycle, crash or deploy drops its
+jobs; fail_if_stale() turns such orphaned replies into failures.
+
+Each job carries the reply's queued_at as a token and only writes its
+result while the reply is still pending with that token, so a job that
+was failed as stale or superseded never overwrites a newer one.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Conversation, Message
+from .services import generate_response, persist_content_items
+from .signals import invalidate_conversation_list
+
+logger = logging.getLogger(__name__)
+
+FAILED_REPLY = 'Sorry, something went wrong. Please try again.'
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.GENERATION_WORKERS, thread_name_prefix='vizzy-gen'
+)
+
+
+def enqueue_generation(assistant_message, user_message, content, mode=None, refinement_url=None):
+    """Schedule generation of `assistant_message` in reply to `user_message`."""
+    args = (
+        assistant_message.id, user_message.id, content, mode, refinement_url,
+        assistant_message.queued_at,
+    )
+    if settings.GENERATION_IN_BACKGROUND:
+        # The worker has its own DB connection; don't start it before the
+        # caller's transaction (if any) has committed the messages
+        transaction.on_commit(lambda: _executor.submit(_run_in_background, *args))
+    else:
+        run_generation(*args)
+
+
+def seconds_until_stale(message):
+    """Seconds left before a pending `message` counts as lost (0 if it already does)."""
+    queued_at = message.queued_at or message.created_at
+    deadline = queued_at + timedelta(seconds=settings.GENERATION_STALE_AFTER)
+    return max((deadline - timezone.now()).total_seconds(), 0)
+
+
+def fail_if_stale(message):
+    """
+    Mark a pending reply failed if its job has been running longer than
+    GENERATION_STALE_AFTER, i.e. it was lost with its worker. Returns True
+    if the message was failed.
+    """
+    if message.status != 'pending' or seconds_until_stale(message) > 0:
+        return False
+    failed = Message.objects.filter(pk=message.pk, status='pending').update(
+        content=FAILED_REPLY, status='failed'
+    )
+    if failed:
+        logger.warning("Generation for message %s never finished; marking it failed", message.pk)
+        message.content, message.status = FAILED_REPLY, 'failed'
+    return bool(failed)
+
+
+def _run_in_background(*args):
+    try:
+        run_generation(*args)
+    finally:
+        # Pool threads outlive the job; don't leave their DB connections open
+        connections.close_all()
+
+
+def run_generation(assistant_message_id, user_message_id, content, mode=None,
+                   refinement_url=None, queued_at=None):
+    """
+    Generate the AI reply and fill in the pending assistant message, if it
+    is still pending and was queued at `queued_at` (see module docstring).
+    """
+    # Only this job's own, still pending reply may be written
+    own_reply = Message.objects.filter(
+        id=assistant_message_id, status='pending', queued_at=queued_at
+    )
+    try:
+        user_message = Message.objects.with_conversation().get(id=user_message_id)
+        conversation = user_message.conversation
+
+        ai_result = generate_response(
+            content,
+            conversation=conversation,
+            image_file=user_message.image or None,
+            mode=mode,
+            refinement_url=refinement_url
+        )
+
+        # The reply, its contents and the touch land in one commit, so a
+        # poll never sees the message complete without its images
+        with transaction.atomic():
+            completed = own_reply.update(
+                content=ai_result['response_text'],
+                message_type=ai_result['message_type'],
+                status='complete',
+            )
+            if not completed:
+                logger.info("Message %s was failed or requeued meanwhile; dropping this result",
+                            assistant_message_id)
+                return
+            persist_content_items(Message(id=assistant_message_id), ai_result['content_items'])
+
+            # Touch conversation to update timestamp
+            Conversation.objects.filter(pk=conversation.pk).update(updated_at=timezone.now())
+            invalidate_conversation_list(conversation.user_id)
+    except Exception as e:
+        logger.exception("Generation failed for message %s: %s", assistant_message_id, e)
+        own_reply.update(content=FAILED_REPLY, status='failed')
@@ -1,3 +1,508 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Conversation, Message
+from .services import (
+    GEMINI_BREAKER_COOLDOWN, GEMINI_BREAKER_THRESHOLD, GEMINI_TEXT_MODELS, _HTTP, _HTTP_ADAPTER,
+    _generate_gemini_content, _generate_huggingface_image, _race_image_providers,
+    _resolve_media_path, _score_intents, classify_intent,
+)
+from .tasks import run_generation
+
+
+AI_RESULT = {
+    'response_text': 'Here you go.',
+    'content_items': [],
+    'message_type': 'text',
+}
+CONTENT_ITEM = {
+    'content_type': 'image',
+    'title': 'Cat',
+    'description': 'A cat',
+    'image_url': '/media/generated/cat.png',
+    'prompt_used': 'a cat',
+}
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        self.client.force_login(self.user)
+        self.conversation = Conversation.objects.create(user=self.user)
+
+    def post_json(self, url, body):
+        return self.client.post(url, data=json.dumps(body), content_type='application/json')
+
+    def send(self, content='hello', **extra):
+        return self.post_json('/api/messages/', {
+            'conversation_id': str(self.conversation.id), 'content': content, **extra,
+        })
+
+
+@override_settings(GENERATION_IN_BACKGROUND=False)
+@mock.patch('chat.tasks.generate_response', return_value=AI_RESULT)
+class GenerationTests(ApiTestCase):
+    def test_send_returns_202_and_poll_sees_complete_reply(self, generate):
+        response = self.send()
+        self.assertEqual(response.status_code, 202)
+        reply = response.json()['assistant_message']
+
+        poll = self.client.get(f"/api/messages/{reply['id']}/").json()
+        self.assertEqual(poll['status'], 'complete')
+        self.assertEqual(poll['content'], 'Here you go.')
+
+    def test_failed_generation_marks_reply_failed(self, generate):
+        generate.side_effect = RuntimeError('provider down')
+        with self.assertLogs('chat.tasks', 'ERROR'):
+            reply = self.send().json()['assistant_message']
+
+        poll = self.client.get(f"/api/messages/{reply['id']}/").json()
+        self.assertEqual(poll['status'], 'failed')
+
+    def test_regenerate_repeats_mode_and_refinement_url(self, generate):
+        reply = self.send(mode='video', refinement_url='/media/a.png').json()['assistant_message']
+
+        response = self.client.post(f"/api/messages/{reply['id']}/regenerate/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'complete')
+        kwargs = generate.call_args.kwargs
+        self.assertEqual(kwargs['mode'], 'video')
+        self.assertEqual(kwargs['refinement_url'], '/media/a.png')
+
+
+@mock.patch('chat.views.enqueue_generation')
+class PendingReplyTests(ApiTestCase):
+    def test_reply_stays_pending_until_the_job_finishes(self, enqueue):
+        response = self.send()
+        self.assertEqual(response.status_code, 202)
+        reply = response.json()['assistant_message']
+        self.assertEqual(reply['status'], 'pending')
+
+        poll = self.client.get(f"/api/messages/{reply['id']}/").json()
+        self.assertEqual(poll['status'], 'pending')
+
+    @override_settings(GENERATION_STALE_AFTER=60)
+    def test_pending_reply_says_how_long_to_keep_polling(self, enqueue):
+        reply = self.send().json()['assistant_message']
+        self.assertGreater(reply['stale_in'], 50)
+        self.assertLessEqual(reply['stale_in'], 60)
+
+    @override_settings(GENERATION_STALE_AFTER=60)
+    def test_lost_job_is_failed_when_polled(self, enqueue):
+        reply = self.send().json()['assistant_message']
+        Message.objects.filter(id=reply['id']).update(
+            queued_at=timezone.now() - timedelta(seconds=61)
+        )
+
+        with self.assertLogs('chat.tasks', 'WARNING'):
+            poll = self.client.get(f"/api/messages/{reply['id']}/").json()
+        self.assertEqual(poll['status'], 'failed')
+        self.assertEqual(Message.objects.get(id=reply['id']).status, 'failed')
+
+    def test_regenerate_is_refused_while_the_reply_is_pending(self, enqueue):
+        reply = self.send().json()['assistant_message']
+
+        response = self.client.post(f"/api/messages/{reply['id']}/regenerate/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(enqueue.call_count, 1)
+
+    @override_settings(GENERATION_STALE_AFTER=60)
+    def test_regenerate_replaces_a_lost_job(self, enqueue):
+        reply = self.send().json()['assistant_message']
+        Message.objects.filter(id=reply['id']).update(
+            queued_at=timezone.now() - timedelta(seconds=61)
+        )
+
+        with self.assertLogs('chat.tasks', 'WARNING'):
+            response = self.client.post(f"/api/messages/{reply['id']}/regenerate/")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(enqueue.call_count, 2)
+
+
+@mock.patch('chat.tasks.generate_response')
+class GenerationTokenTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.prompt = Message.objects.create(conversation=self.conversation, role='user', content='hi')
+        self.queued_at = timezone.now()
+        self.reply = Message.objects.create(
+            conversation=self.conversation, role='assistant', content='',
+            status='pending', queued_at=self.queued_at, prompt_message=self.prompt,
+        )
+
+    def run_job(self, queued_at):
+        run_generation(self.reply.id, self.prompt.id, 'hi', queued_at=queued_at)
+        self.reply.refresh_from_db()
+
+    def test_job_fills_in_its_own_reply(self, generate):
+        generate.return_value = dict(AI_RESULT, content_items=[CONTENT_ITEM])
+        self.run_job(self.queued_at)
+        self.assertEqual(self.reply.status, 'complete')
+        self.assertEqual(self.reply.generated_contents.count(), 1)
+
+    def test_superseded_job_writes_nothing(self, generate):
+        generate.return_value = dict(AI_RESULT, content_items=[CONTENT_ITEM])
+        self.run_job(self.queued_at - timedelta(seconds=1))
+        self.assertEqual(self.reply.status, 'pending')
+        self.assertFalse(self.reply.generated_contents.exists())
+
+    def test_superseded_job_does_not_fail_the_reply(self, generate):
+        generate.side_effect = RuntimeError('provider down')
+        with self.assertLogs('chat.tasks', 'ERROR'):
+            self.run_job(self.queued_at - timedelta(seconds=1))
+        self.assertEqual(self.reply.status, 'pending')
+
+    def test_job_does_not_overwrite_a_stale_failure(self, generate):
+        generate.return_value = AI_RESULT
+        Message.objects.filter(id=self.reply.id).update(status='failed')
+        self.run_job(self.queued_at)
+        self.assertEqual(self.reply.status, 'failed')
+
+
+@mock.patch('chat.views.enqueue_generation')
+class SendMessageValidationTests(ApiTestCase):
+    def test_non_object_json_is_rejected(self, enqueue):
+        for body in ('[]', '"hello"', '{not json'):
+            with self.subTest(body=body):
+                response = self.client.post('/api/messages/', data=body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        enqueue.assert_not_called()
+
+    def test_non_string_fields_are_rejected(self, enqueue):
+        for extra in ({'content': None}, {'content': 5}, {'content': ['hi']}, {'mode': 3},
+                      {'mode': 'bogus'}, {'refinement_url': {}}, {'conversation_id': 'nope'}):
+            with self.subTest(extra=extra):
+                body = {'conversation_id': str(self.conversation.id), 'content': 'hi', **extra}
+                self.assertEqual(self.post_json('/api/messages/', body).status_code, 400)
+        enqueue.assert_not_called()
+
+
+class OwnerScopingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reply = Message.objects.create(
+            conversation=self.conversation, role='assistant', content='hi'
+        )
+        self.client.force_login(User.objects.create_user('mallory', 'm@example.com', 'pw'))
+
+    def test_other_users_conversation_is_not_found(self):
+        self.assertEqual(self.client.get(f'/api/conversations/{self.conversation.id}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/conversations/{self.conversation.id}/').status_code, 404)
+        self.assertEqual(self.send().status_code, 404)
+
+    def test_other_users_message_is_not_found(self):
+        self.assertEqual(self.client.get(f'/api/messages/{self.reply.id}/').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/messages/{self.reply.id}/regenerate/').status_code, 404)
+
+    def test_other_users_conversations_are_not_listed(self):
+        self.assertEqual(self.client.get('/api/conversations/').json()['conversations'], [])
+
+
+class ConversationListCacheTests(ApiTestCase):
+    def get_list(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get('/api/conversations/', **headers)
+
+    def test_unchanged_list_returns_304(self):
+        etag = self.get_list()['ETag']
+        self.assertEqual(self.get_list(etag).status_code, 304)
+
+    def test_rename_invalidates_cached_list(self):
+        etag = self.get_list()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f'/api/conversations/{self.conversation.id}/',
+                data=json.dumps({'title': 'Renamed'}), content_type='application/json',
+            )
+
+        response = self.get_list(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['conversations'][0]['title'], 'Renamed')
+
+    def test_new_message_invalidates_cached_list(self):
+        self.get_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(conversation=self.conversation, role='user', content='hi')
+
+        self.assertEqual(self.get_list().json()['conversations'][0]['message_count'], 1)
+
+    def test_delete_invalidates_cached_list(self):
+        self.get_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/conversations/{self.conversation.id}/')
+
+        self.assertEqual(self.get_list().json()['conversations'], [])
+
+
+class IntentScoringTests(TestCase):
+    def test_keywords_match_at_word_start_only(self):
+        scores = _score_intents('a logo design')
+        self.assertNotIn('poster_design', scores)  # 'sign' inside 'design'
+        self.assertIn('image_generation', scores)
+
+    def test_keyword_prefix_matches_longer_word(self):
+        self.assertEqual(_score_intents('a painting of a cat'), {'image_generation': 1})
+
+    @mock.patch('chat.services.get_genai_client')
+    def test_clear_keyword_winner_skips_gemini(self, get_client):
+        self.assertEqual(classify_intent('make a looping video animation'), ('video_loop', 0.9))
+        get_client.assert_not_called()
+
+    @mock.patch('chat.services.get_genai_client', return_value=None)
+    def test_close_scores_fall_through_to_classifier(self, get_client):
+        intent, confidence = classify_intent('draw a poster')
+        get_client.assert_called_once()
+        self.assertIn(intent, ('image_generation', 'poster_design'))
+        self.assertLess(confidence, 0.9)
+
+
+def fake_response(status_code, body=b''):
+    response = mock.MagicMock(status_code=status_code, content=body, text=body.decode())
+    response.__enter__.return_value = response
+    return response
+
+
+class ProviderRetryTests(TestCase):
+    def test_only_idempotent_requests_retry_gateway_errors(self):
+        retry = _HTTP_ADAPTER.max_retries
+        self.assertTrue(retry.is_retry('GET', 503))
+        self.assertFalse(retry.is_retry('POST', 503))
+
+    @override_settings(HUGGINGFACE_API_KEY='key')
+    @mock.patch('chat.services.time.sleep')
+    def test_hugging_face_retries_once_while_the_model_loads(self, sleep):
+        loading = fake_response(503, b'{"error": "Model is currently loading", "estimated_time": 3.5}')
+        with mock.patch.object(_HTTP, 'post', side_effect=[loading, loading]) as post, \
+                self.assertLogs('chat.services', 'ERROR'):
+            self.assertIsNone(_generate_huggingface_image('a cat'))
+        self.assertEqual(post.call_count, 2)
+        sleep.assert_called_once_with(3.5)
+
+    @override_settings(HUGGINGFACE_API_KEY='key')
+    @mock.patch('chat.services.time.sleep')
+    def test_hugging_face_does_not_retry_other_errors(self, sleep):
+        with mock.patch.object(_HTTP, 'post', return_value=fake_response(503, b'overloaded')) as post, \
+                self.assertLogs('chat.services', 'ERROR'):
+            self.assertIsNone(_generate_huggingface_image('a cat'))
+        self.assertEqual(post.call_count, 1)
+        sleep.assert_not_called()
+
+
+class ProviderError(Exception):
+    def __init__(self, code):
+        super().__init__(f'provider error {code}')
+        self.code = code
+
+
+class GeminiCircuitBreakerTests(TestCase):
+    preferred, fallback = GEMINI_TEXT_MODELS[0], GEMINI_TEXT_MODELS[-1]
+
+    def setUp(self):
+        patcher = mock.patch.multiple(
+            'chat.services',
+            _gemini_text_model=self.preferred, _gemini_failures=0, _gemini_preferred_retry_at=0.0,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = 1000.0
+        clock = mock.patch('chat.services.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.client = mock.Mock()
+        self.models_called = []
+
+    def respond(self, fail_preferred):
+        def generate_content(model, contents, config=None):
+            self.models_called.append(model)
+            if model == self.preferred and fail_preferred:
+                raise ProviderError(503)
+            return f'reply from {model}'
+        self.client.models.generate_content.side_effect = generate_content
+
+    def call(self):
+        return _generate_gemini_content(self.client, 'hi')
+
+    def trip(self):
+        self.respond(fail_preferred=True)
+        with self.assertLogs('chat.services', 'WARNING') as logs:
+            for _ in range(GEMINI_BREAKER_THRESHOLD):
+                with self.assertRaises(ProviderError):
+                    self.call()
+        return logs
+
+    def test_transient_failures_below_threshold_keep_the_preferred_model(self):
+        self.respond(fail_preferred=True)
+        for _ in range(GEMINI_BREAKER_THRESHOLD - 1):
+            with self.assertRaises(ProviderError):
+                self.call()
+        self.respond(fail_preferred=False)
+        self.assertEqual(self.call(), f'reply from {self.preferred}')
+
+    def test_breaker_trips_after_threshold_failures(self):
+        self.trip()
+        self.assertEqual(self.call(), f'reply from {self.fallback}')
+
+    def test_breaker_recovers_after_cooldown(self):
+        self.trip()
+        self.now += GEMINI_BREAKER_COOLDOWN + 1
+        self.respond(fail_preferred=False)
+        self.assertEqual(self.call(), f'reply from {self.preferred}')
+
+    def test_unavailable_model_switches_for_good(self):
+        def generate_content(model, contents, config=None):
+            if model == self.preferred:
+                raise ProviderError(404)
+            return f'reply from {model}'
+        self.client.models.generate_content.side_effect = generate_content
+        with self.assertLogs('chat.services', 'WARNING'):
+            self.assertEqual(self.call(), f'reply from {self.fallback}')
+        self.now += GEMINI_BREAKER_COOLDOWN + 1
+        self.assertEqual(self.call(), f'reply from {self.fallback}')
+
+    def test_concurrent_failures_trip_the_breaker_once(self):
+        callers = 2 * GEMINI_BREAKER_THRESHOLD
+        barrier = threading.Barrier(callers)
+
+        def generate_content(model, contents, config=None):
+            barrier.wait(timeout=5)  # every call has picked its model
+            raise ProviderError(503)
+        self.client.models.generate_content.side_effect = generate_content
+
+        def call():
+            with self.assertRaises(ProviderError):
+                self.call()
+
+        with self.assertLogs('chat.services', 'WARNING') as logs:
+            threads = [threading.Thread(target=call) for _ in range(callers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(logs.records), 1)
+
+
+class ImageProviderRaceTests(TestCase):
+    def test_sequential_runs_providers_in_order_until_one_succeeds(self):
+        calls = []
+
+        def provider(name, urls):
+            def generate(cancel):
+                calls.append((name, threading.current_thread()))
+                return urls
+            return generate
+
+        providers = [provider('a', []), provider('b', ['b.png']), provider('c', ['c.png'])]
+        self.assertEqual(_race_image_providers(providers, hedge_delay=0), ['b.png'])
+        self.assertEqual(calls, [('a', threading.current_thread()), ('b', threading.current_thread())])
+
+    def test_hedging_is_off_by_default(self):
+        threads = []
+
+        def provider(cancel):
+            threads.append(threading.current_thread())
+            return ['a.png']
+
+        self.assertEqual(_race_image_providers([provider, provider]), ['a.png'])
+        self.assertEqual(threads, [threading.current_thread()])
+
+    def test_fast_provider_wins_and_slow_one_is_cancelled(self):
+        finished = threading.Event()
+        saw_cancel = []
+
+        def slow(cancel):
+            time.sleep(0.2)
+            saw_cancel.append(cancel.is_set())
+            finished.set()
+            return ['slow.png']
+
+        def fast(cancel):
+            return ['fast.png']
+
+        with self.assertLogs('chat.services', 'DEBUG'):
+            self.assertEqual(_race_image_providers([slow, fast], hedge_delay=0.05), ['fast.png'])
+        self.assertTrue(finished.wait(2))
+        self.assertEqual(saw_cancel, [True])
+
+    def test_failing_provider_does_not_abort_the_race(self):
+        def broken(cancel):
+            raise RuntimeError('provider down')
+
+        def working(cancel):
+            return ['ok.png']
+
+        for hedge_delay in (0, 0.05):
+            with self.subTest(hedge_delay=hedge_delay), self.assertLogs('chat.services', 'ERROR'):
+                self.assertEqual(_race_image_providers([broken, working], hedge_delay), ['ok.png'])
+
+    def test_all_providers_failing_returns_nothing(self):
+        def empty(cancel):
+            return []
+
+        self.assertEqual(_race_image_providers([empty, empty], hedge_delay=0.05), [])
+
+
+class MediaPathTests(TestCase):
+    def test_media_url_maps_into_media_root(self):
+        self.assertEqual(
+            _resolve_media_path(settings.MEDIA_URL + 'uploads/a.png'),
+            Path(settings.MEDIA_ROOT) / 'uploads' / 'a.png',
+        )
+
+    def test_traversal_out_of_media_root_is_rejected(self):
+        for rest in ('../settings.py', 'uploads/../../settings.py', 'a/../../../etc/passwd'):
+            with self.subTest(rest=rest):
+                self.assertIsNone(_resolve_media_path(settings.MEDIA_URL + rest))
+
+    def test_urls_outside_media_url_are_rejected(self):
+        for url in ('/etc/passwd', 'file:///etc/passwd', 'https://example.com/media/a.png'):
+            with self.subTest(url=url):
+                self.assertIsNone(_resolve_media_path(url))
+
+    def test_absolute_path_after_media_url_stays_in_media_root(self):
+        path = _resolve_media_path(settings.MEDIA_URL + '/etc/passwd')
+        self.assertEqual(path, Path(settings.MEDIA_ROOT) / 'etc' / 'passwd')
+
+
+class MessageAdminTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(user)
+        self.conversation = Conversation.objects.create(user=user)
+
+    def add_messages(self, count, content='x' * 100):
+        Message.objects.bulk_create(
+            Message(conversation=self.conversation, role='user', content=content)
+            for _ in range(count)
+        )
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/chat/message/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_shows_truncated_preview(self):
+        self.add_messages(1)
+        html = self.client.get('/admin/chat/message/').content.decode()
+        self.assertIn('x' * 80 + '...', html)
+        self.assertNotIn('x' * 81, html)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_messages(2)
+        self.changelist_queries()  # warm the session
+        few = self.changelist_queries()
+        self.add_messages(10)
+        self.assertEqual(self.changelist_queries(), few)
@@ -16,6 +16,7 @@ urlpatterns = [
 
     # Message API
     path('api/messages/', views.send_message, name='send_message'),
+    path('api/messages/<uuid:message_id>/', views.message_detail, name='message_detail'),
     path('api/messages/<uuid:message_id>/regenerate/', views.regenerate_message, name='regenerate_message'),
 ]
 
@@ -7,17 +7,26 @@ Provides JSON API endpoints for the chat frontend:
 - Response regeneration
 """
 
+import hashlib
 import json
-from django.http import JsonResponse
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import condition, require_http_methods
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.utils import timezone
 
-from .models import Conversation, Message, GeneratedContent
-from .services import generate_response
+from .http import OrjsonResponse, dumps, loads
+from .models import Conversation, GeneratedContent, Message
+from .signals import conversation_list_cache_key
+from .tasks import enqueue_generation, fail_if_stale, seconds_until_stale
 
 
 # ---------------------------------------------------------------------------
@@ -80,42 +89,78 @@ def index(request):
     return render(request, 'chat/index.html')
 
 
+def _owner(request):
+    """The user whose conversations this request may access (None if anonymous)."""
+    return request.user if request.user.is_authenticated else None
+
+
 # ---------------------------------------------------------------------------
 # Conversation endpoints
 # ---------------------------------------------------------------------------
 
+def _conversation_list_json(user):
+    """
+    The user's serialized conversation list, cached until chat.signals
+    sees a change to one of their conversations or messages.
+    """
+    key = conversation_list_cache_key(user.pk)
+    blob = cache.get(key)
+    if blob is None:
+        # values() fetches just the listed columns, skipping user_context
+        conversations = (
+            Conversation.objects.filter(user=user)
+            .values('id', 'title', 'created_at', 'updated_at')
+            .annotate(message_count=Count('messages'))
+        )
+        data = [
+            {
+                'id': str(c['id']),
+                'title': c['title'],
+                'created_at': c['created_at'].isoformat(),
+                'updated_at': c['updated_at'].isoformat(),
+                'message_count': c['message_count'],
+            }
+            for c in conversations
+        ]
+        blob = dumps({'conversations': data})
+        cache.set(key, blob, settings.CACHE_TTL_CONVERSATION_LIST)
+    return blob
+
+
+def _conversation_list_etag(request):
+    """
+    ETag for the sidebar list, from the cached JSON: an unchanged list is
+    answered with 304 without touching the database.
+    """
+    if request.method != 'GET':
+        return None
+    return hashlib.md5(_conversation_list_json(request.user)).hexdigest()
+
+
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
+@condition(etag_func=_conversation_list_etag)
 def conversation_list(request):
     """
     GET  /api/conversations/  → list all conversations
     POST /api/conversations/  → create new conversation
     """
     if request.method == 'GET':
-        conversations = Conversation.objects.filter(user=request.user)
-        data = [
-            {
-                'id': str(c.id),
-                'title': c.title,
-                'created_at': c.created_at.isoformat(),
-                'updated_at': c.updated_at.isoformat(),
-                'message_count': c.messages.count(),
-            }
-            for c in conversations
-        ]
-        return JsonResponse({'conversations': data})
+        return HttpResponse(_conversation_list_json(request.user), content_type='application/json')
 
     # POST — create new conversation
+    # An empty or malformed body just creates an untitled conversation
     try:
-        body = json.loads(request.body) if request.body else {}
+        body = loads(request.body or b'{}')
     except json.JSONDecodeError:
         body = {}
+    if not isinstance(body, dict):
+        body = {}
 
     title = body.get('title', 'New Chat')
-    user = request.user if request.user.is_authenticated else None
-    conversation = Conversation.objects.create(title=title, user=user)
+    conversation = Conversation.objects.create(title=title, user=_owner(request))
 
-    return JsonResponse({
+    return OrjsonResponse({
         'id': str(conversation.id),
         'title': conversation.title,
         'created_at': conversation.created_at.isoformat(),
@@ -123,6 +168,55 @@ def conversation_list(request):
     }, status=201)
 
 
+# GeneratedContent columns the API returns (skips the long prompt_used)
+GENERATED_CONTENT_FIELDS = ('id', 'message_id', 'content_type', 'title', 'description', 'image_url')
+
+
+def _generated_content_data(gc):
+    return {
+        'id': str(gc.id),
+        'content_type': gc.content_type,
+        'title': gc.title,
+        'description': gc.description,
+        'image_url': gc.image_url,
+    }
+
+
+def _message_data(msg, generated_contents=None):
+    """
+    Serialize a message for the API. Its generated contents are read from
+    msg.generated_contents (prefetch them for lists) unless given.
+    """
+    if generated_contents is None:
+        generated_contents = msg.generated_contents.all()
+    data = {
+        'id': str(msg.id),
+        'role': msg.role,
+        'content': msg.content,
+        'message_type': msg.message_type,
+        'status': msg.status,
+        'image_url': msg.image.url if msg.image else None,
+        'created_at': msg.created_at.isoformat(),
+        'generated_contents': [_generated_content_data(gc) for gc in generated_contents],
+    }
+    if msg.status == 'pending':
+        # How long clients should keep polling before the server gives up on it
+        data['stale_in'] = seconds_until_stale(msg)
+    return data
+
+
+def _stream_conversation(header, messages):
+    """
+    Yield a conversation's JSON piece by piece: the `header` object with a
+    'messages' array appended, one message at a time, so long histories
+    are never held in memory as a whole list and string.
+    """
+    yield header[:-1] + b',"messages":['
+    for i, msg in enumerate(messages.iterator(chunk_size=100)):
+        yield (b',' if i else b'') + dumps(_message_data(msg))
+    yield b']}'
+
+
 @csrf_exempt
 @require_http_methods(["GET", "PUT", "DELETE"])
 def conversation_detail(request, conversation_id):
@@ -131,59 +225,47 @@ def conversation_detail(request, conversation_id):
     PUT    /api/conversations/<id>/  → rename conversation
     DELETE /api/conversations/<id>/  → delete conversation
     """
-    conversation = get_object_or_404(Conversation, id=conversation_id)
+    conversation = get_object_or_404(Conversation, id=conversation_id, user=_owner(request))
 
     if request.method == 'GET':
-        messages = conversation.messages.all()
-        messages_data = []
-        for msg in messages:
-            contents = msg.generated_contents.all()
-            messages_data.append({
-                'id': str(msg.id),
-                'role': msg.role,
-                'content': msg.content,
-                'message_type': msg.message_type,
-                'image_url': msg.image.url if msg.image else None,
-                'created_at': msg.created_at.isoformat(),
-                'generated_contents': [
-                    {
-                        'id': str(gc.id),
-                        'content_type': gc.content_type,
-                        'title': gc.title,
-                        'description': gc.description,
-                        'image_url': gc.image_url,
-                    }
-                    for gc in contents
-                ],
-            })
-
-        return JsonResponse({
+        messages = conversation.messages.prefetch_related(
+            Prefetch(
+                'generated_contents',
+                queryset=GeneratedContent.objects.only(*GENERATED_CONTENT_FIELDS),
+            )
+        )
+        header = dumps({
             'id': str(conversation.id),
             'title': conversation.title,
             'created_at': conversation.created_at.isoformat(),
             'updated_at': conversation.updated_at.isoformat(),
-            'messages': messages_data,
         })
+        return StreamingHttpResponse(
+            _stream_conversation(header, messages),
+            content_type='application/json',
+        )
 
     if request.method == 'PUT':
         try:
-            body = json.loads(request.body)
+            body = loads(request.body)
         except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+            body = None
+        if not isinstance(body, dict):
+            return OrjsonResponse({'error': 'Invalid JSON'}, status=400)
 
         title = body.get('title')
         if title:
             conversation.title = title
             conversation.save()
 
-        return JsonResponse({
+        return OrjsonResponse({
             'id': str(conversation.id),
             'title': conversation.title,
         })
 
     if request.method == 'DELETE':
         conversation.delete()
-        return JsonResponse({'status': 'deleted'})
+        return OrjsonResponse({'status': 'deleted'})
 
 
 @csrf_exempt
@@ -193,7 +275,8 @@ def send_message(request):
     POST /api/messages/
     Body: { "conversation_id": "...", "content": "...", "mode": "..." }
 
-    Creates user message, generates AI response, returns both.
+    Creates the user message and a pending assistant message, schedules
+    AI generation, and returns both with 202 Accepted.
     """
     # Handle both JSON and Multipart requests
     conversation_id = None
@@ -202,7 +285,8 @@ def send_message(request):
     mode = None
     refinement_url = None
 
-    if request.content_type.startswith('multipart/form-data'):
+    # content_type is parsed once by Django and excludes the boundary parameter
+    if request.content_type == 'multipart/form-data':
         content = request.POST.get('content', '').strip()
         conversation_id = request.POST.get('conversation_id')
         mode = request.POST.get('mode')
@@ -210,95 +294,109 @@ def send_message(request):
         refinement_url = request.POST.get('refinement_url')
     else:
         try:
-            body = json.loads(request.body)
+            body = loads(request.body)
         except json.JSONDecodeError:
-            return JsonResponse({'error': 'Invalid JSON'}, status=400)
-        content = body.get('content', '').strip()
+            body = None
+        if not isinstance(body, dict):
+            return OrjsonResponse({'error': 'Invalid JSON'}, status=400)
+        content = body.get('content') or ''
         conversation_id = body.get('conversation_id')
         mode = body.get('mode')
         refinement_url = body.get('refinement_url')
+        # JSON can carry any type; only strings (or absent optionals) are valid
+        if not isinstance(content, str) or any(
+            value is not None and not isinstance(value, str)
+            for value in (conversation_id, mode, refinement_url)
+        ):
+            return OrjsonResponse(
+                {'error': 'conversation_id, content, mode and refinement_url must be strings'},
+                status=400,
+            )
+        content = content.strip()
 
     if not conversation_id or (not content and not image_file):
-        return JsonResponse(
+        return OrjsonResponse(
             {'error': 'conversation_id and content (or image) are required'}, status=400
         )
+    try:
+        uuid.UUID(conversation_id)
+    except ValueError:
+        return OrjsonResponse({'error': 'Invalid conversation_id'}, status=400)
+    if mode and mode not in dict(Message.MODE_CHOICES):
+        return OrjsonResponse({'error': 'Invalid mode'}, status=400)
+
+    # Only what's needed here; the worker loads the full conversation itself
+    conversation = get_object_or_404(
+        Conversation.objects.only('id', 'title', 'user_id'),
+        id=conversation_id, user=_owner(request)
+    )
 
-    conversation = get_object_or_404(Conversation, id=conversation_id)
+    # The user message, title and placeholder reply commit together
+    with transaction.atomic():
+        # Create user message
+        user_message = Message.objects.create(
+            conversation=conversation,
+            role='user',
+            content=content if content else '[Image Uploaded]',
+            message_type='text' if not image_file else 'image_transformation',
+            image=image_file,
+            mode=mode or '',
+            refinement_url=refinement_url or '',
+        )
 
-    # Create user message
-    user_message = Message.objects.create(
-        conversation=conversation,
-        role='user',
-        content=content if content else '[Image Uploaded]',
-        message_type='text' if not image_file else 'image_transformation',
-        image=image_file
-    )
+        # Auto-title conversation from first message
+        if not conversation.messages.filter(role='user').exclude(pk=user_message.pk).exists():
+            title_text = content if content else 'Image Upload'
+            title = title_text[:50] + ('...' if len(title_text) > 50 else '')
+            conversation.title = title
+            # Single-column UPDATE instead of rewriting the whole row
+            Conversation.objects.filter(pk=conversation.pk).update(
+                title=title, updated_at=timezone.now()
+            )
+
+        # Placeholder reply that the background job fills in; the client polls it
+        assistant_message = Message.objects.create(
+            conversation=conversation,
+            role='assistant',
+            content='',
+            status='pending',
+            queued_at=timezone.now(),
+            prompt_message=user_message,
+        )
 
-    # Auto-title conversation from first message
-    if conversation.messages.filter(role='user').count() == 1:
-        title_text = content if content else 'Image Upload'
-        title = title_text[:50] + ('...' if len(title_text) > 50 else '')
-        conversation.title = title
-        conversation.save()
-
-    # Generate AI response -- PASSING MODE + REFINEMENT
-    ai_result = generate_response(
-        content, 
-        conversation=conversation, 
-        image_file=user_message.image if image_file else None,
+    enqueue_generation(
+        assistant_message,
+        user_message,
+        content,
         mode=mode,
         refinement_url=refinement_url
     )
+    # Picks up the finished reply when generation ran inline
+    assistant_message.refresh_from_db()
 
-    assistant_message = Message.objects.create(
-        conversation=conversation,
-        role='assistant',
-        content=ai_result['response_text'],
-        message_type=ai_result['message_type'],
-    )
+    # A new user message has no generated contents; skip the query
+    user_data = _message_data(user_message, generated_contents=())
+    if not user_message.image:
+        user_data['image_url'] = refinement_url or None
 
-    # Create generated content items
-    generated_contents = []
-    for item in ai_result['content_items']:
-        gc = GeneratedContent.objects.create(
-            message=assistant_message,
-            content_type=item['content_type'],
-            title=item['title'],
-            description=item['description'],
-            image_url=item['image_url'],
-            prompt_used=item['prompt_used'],
-        )
-        generated_contents.append({
-            'id': str(gc.id),
-            'content_type': gc.content_type,
-            'title': gc.title,
-            'description': gc.description,
-            'image_url': gc.image_url,
-        })
-
-    # Touch conversation to update timestamp
-    conversation.save()
-
-    return JsonResponse({
-        'user_message': {
-            'id': str(user_message.id),
-            'role': 'user',
-            'content': user_message.content,
-            'message_type': user_message.message_type,
-            'image_url': user_message.image.url if user_message.image else (refinement_url or None),
-            'created_at': user_message.created_at.isoformat(),
-            'generated_contents': [],
-        },
-        'assistant_message': {
-            'id': str(assistant_message.id),
-            'role': 'assistant',
-            'content': assistant_message.content,
-            'message_type': assistant_message.message_type,
-            'created_at': assistant_message.created_at.isoformat(),
-            'generated_contents': generated_contents,
-        },
+    return OrjsonResponse({
+        'user_message': user_data,
+        'assistant_message': _message_data(assistant_message),
         'conversation_title': conversation.title,
-    })
+    }, status=202)
+
+
+@require_http_methods(["GET"])
+def message_detail(request, message_id):
+    """
+    GET /api/messages/<id>/
+
+    Returns a single message. Clients poll this while an assistant
+    reply is still 'pending'; a reply whose job was lost is failed here.
+    """
+    message = get_object_or_404(Message, id=message_id, conversation__user=_owner(request))
+    fail_if_stale(message)
+    return OrjsonResponse(_message_data(message))
 
 
 @csrf_exempt
@@ -308,55 +406,51 @@ def regenerate_message(request, message_id):
     POST /api/messages/<id>/regenerate/
 
     Regenerates the AI response for a given assistant message.
-    Finds the preceding user message and generates a new response.
+    Finds the preceding user message, marks the reply 'pending' and
+    regenerates it in the background; returns 202 Accepted, or 409
+    Conflict while the reply is still being generated.
     """
-    assistant_message = get_object_or_404(Message, id=message_id, role='assistant')
-    conversation = assistant_message.conversation
-
-    # Find the user message that preceded this assistant message
-    user_message = (
-        conversation.messages
-        .filter(role='user', created_at__lt=assistant_message.created_at)
-        .order_by('-created_at')
-        .first()
+    assistant_message = get_object_or_404(
+        Message.objects.with_conversation().select_related('prompt_message'),
+        id=message_id, role='assistant', conversation__user=_owner(request)
     )
+    conversation = assistant_message.conversation
+    # A running job would race the new one; let it finish (or go stale) first
+    fail_if_stale(assistant_message)
+    if assistant_message.status == 'pending':
+        return OrjsonResponse({'error': 'This reply is still being generated'}, status=409)
+
+    user_message = assistant_message.prompt_message
+    if user_message is None:
+        # Replies saved before prompt_message existed: use the preceding user message
+        user_message = (
+            conversation.messages
+            .filter(role='user', created_at__lt=assistant_message.created_at)
+            .only('id', 'content', 'mode', 'refinement_url', 'image')
+            .order_by('-created_at')
+            .first()
+        )
 
     if not user_message:
-        return JsonResponse({'error': 'No user message found to regenerate from'}, status=400)
-
-    # Delete old generated contents
-    assistant_message.generated_contents.all().delete()
-
-    # Generate new response
-    ai_result = generate_response(user_message.content, conversation=conversation)
-
-    assistant_message.content = ai_result['response_text']
-    assistant_message.message_type = ai_result['message_type']
-    assistant_message.save()
-
-    generated_contents = []
-    for item in ai_result['content_items']:
-        gc = GeneratedContent.objects.create(
-            message=assistant_message,
-            content_type=item['content_type'],
-            title=item['title'],
-            description=item['description'],
-            image_url=item['image_url'],
-            prompt_used=item['prompt_used'],
-        )
-        generated_contents.append({
-            'id': str(gc.id),
-            'content_type': gc.content_type,
-            'title': gc.title,
-            'description': gc.description,
-            'image_url': gc.image_url,
-        })
+        return OrjsonResponse({'error': 'No user message found to regenerate from'}, status=400)
+
+    # Clear the old reply and hand regeneration to the background worker
+    with transaction.atomic():
+        assistant_message.generated_contents.all().delete()
+        assistant_message.content = ''
+        assistant_message.status = 'pending'
+        assistant_message.queued_at = timezone.now()
+        assistant_message.save(update_fields=['content', 'status', 'queued_at'])
+
+    # Repeat the original request, including its mode and refinement target
+    enqueue_generation(
+        assistant_message,
+        user_message,
+        user_message.content,
+        mode=user_message.mode or None,
+        refinement_url=user_message.refinement_url or None
+    )
+    # Picks up the finished reply when generation ran inline
+    assistant_message.refresh_from_db()
 
-    return JsonResponse({
-        'id': str(assistant_message.id),
-        'role': 'assistant',
-        'content': assistant_message.content,
-        'message_type': assistant_message.message_type,
-        'created_at': assistant_message.created_at.isoformat(),
-        'generated_contents': generated_contents,
-    })
+    return OrjsonResponse(_message_data(assistant_message), status=202)
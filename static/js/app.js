@@ -238,6 +238,9 @@ function renderMessages(messages) {
     messagesEl.innerHTML = '';
     messages.forEach(msg => {
         appendMessage(msg, false);
+        if (msg.status === 'pending') {
+            resumePendingMessage(msg.id, msg.stale_in).catch(err => console.error('Failed to load reply:', err));
+        }
     });
 }
 
@@ -253,7 +256,8 @@ function appendMessage(msg, animate = true) {
              <path d="M9 14L12 17L19 10" stroke="white" stroke-width="2.5" stroke-linecap="round" stroke-linejoin="round"/>
            </svg>`;
 
-    let contentHtml = `<div class="message-content">${formatText(msg.content)}</div>`;
+    const text = msg.status === 'pending' ? '*Generating response...*' : msg.content;
+    let contentHtml = `<div class="message-content">${formatText(text)}</div>`;
 
     // Render user-uploaded image thumbnail
     if (msg.image_url) {
@@ -500,11 +504,28 @@ async function sendMessage() {
         const tempEl = messagesEl.querySelector('[data-id="temp-user"]');
         if (tempEl) tempEl.remove();
 
-        // Hide typing indicator
-        typingIndicator.style.display = 'none';
-
         appendMessage(data.user_message, false);
-        appendMessage(data.assistant_message);
+
+        // The reply is generated in the background; wait for it
+        let assistantMessage = data.assistant_message;
+        if (assistantMessage.status === 'pending') {
+            typingIndicator.style.display = 'flex';
+            scrollToBottom();
+            try {
+                assistantMessage = await waitForMessage(assistantMessage.id, assistantMessage.stale_in);
+            } catch (err) {
+                // Keep the real id so the reply can still be regenerated
+                console.error('Failed to load reply:', err);
+                assistantMessage = {
+                    id: assistantMessage.id,
+                    role: 'assistant',
+                    content: 'Sorry, this reply is taking too long. Try regenerating it.',
+                    generated_contents: [],
+                };
+            }
+            typingIndicator.style.display = 'none';
+        }
+        appendMessage(assistantMessage);
 
         // Update conversation title
         if (data.conversation_title) {
@@ -530,6 +551,56 @@ async function sendMessage() {
     }
 }
 
+// ─── Pending Replies ─────────────────────────────────────────────────────
+const POLL_INITIAL_MS = 1000;
+const POLL_MAX_MS = 8000;
+// Used when the server doesn't say how long the job may still run
+const POLL_DEFAULT_STALE_S = 600;
+// Slack past the server's deadline for the poll that sees the reply failed
+const POLL_GRACE_MS = 30 * 1000;
+
+async function waitForMessage(messageId, staleIn) {
+    // Poll a background-generated reply until it is no longer pending,
+    // backing off (with jitter) so long generations cost few requests.
+    // The server fails a lost job once its stale_in runs out, so only
+    // give up if we're still told 'pending' well after that.
+    const deadlineFor = s => Date.now() + (s ?? POLL_DEFAULT_STALE_S) * 1000 + POLL_GRACE_MS;
+    let deadline = deadlineFor(staleIn);
+    let interval = POLL_INITIAL_MS;
+    while (Date.now() < deadline) {
+        const delay = interval * (0.8 + Math.random() * 0.4);
+        await new Promise(resolve => setTimeout(resolve, delay));
+        const msg = await api(`/api/messages/${messageId}/`);
+        if (msg.status !== 'pending') return msg;
+        deadline = deadlineFor(msg.stale_in);
+        interval = Math.min(interval * 2, POLL_MAX_MS);
+    }
+    throw new Error('Timed out waiting for the reply');
+}
+
+async function resumePendingMessage(messageId, staleIn) {
+    const conversationId = currentConversationId;
+    let msg;
+    try {
+        msg = await waitForMessage(messageId, staleIn);
+    } catch (err) {
+        console.error('Failed to load reply:', err);
+        msg = {
+            id: messageId,
+            role: 'assistant',
+            content: 'Sorry, this reply is taking too long. Try regenerating it.',
+            generated_contents: [],
+        };
+    }
+    if (conversationId !== currentConversationId) return;
+    const msgEl = messagesEl.querySelector(`[data-id="${messageId}"]`);
+    if (!msgEl) return;
+    const placeholder = document.createElement('div');
+    msgEl.replaceWith(placeholder);
+    appendMessage(msg, false);
+    placeholder.replaceWith(messagesEl.lastElementChild);
+}
+
 // ─── Regeneration ────────────────────────────────────────────────────────
 async function regenerateResponse(messageId) {
     if (isLoading) return;
@@ -547,9 +618,12 @@ async function regenerateResponse(messageId) {
     }
 
     try {
-        const data = await api(`/api/messages/${messageId}/regenerate/`, {
+        let data = await api(`/api/messages/${messageId}/regenerate/`, {
             method: 'POST',
         });
+        if (data.status === 'pending') {
+            data = await waitForMessage(data.id, data.stale_in);
+        }
 
         // Re-render the message
         if (msgEl) {
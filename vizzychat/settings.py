@@ -38,6 +38,38 @@ HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY', '')
 # NVIDIA API Key
 NVIDIA_API_KEY = os.getenv('NVIDIA_API_KEY', '')
 
+# How long (seconds) a Gemini intent classification is cached per message text
+CACHE_TTL_INTENT = int(os.getenv('CACHE_TTL_INTENT', '3600'))
+
+# How long (seconds) an image edit result is reused for the same image + prompt
+CACHE_TTL_GENERATED = int(os.getenv('CACHE_TTL_GENERATED', str(7 * 24 * 3600)))
+
+# Upper bound (seconds) on a cached sidebar list; changes invalidate it sooner
+CACHE_TTL_CONVERSATION_LIST = int(os.getenv('CACHE_TTL_CONVERSATION_LIST', '300'))
+
+# AI replies are generated on a background thread pool so a slow provider
+# doesn't hold the web worker. Set to False to generate inline.
+GENERATION_IN_BACKGROUND = os.getenv('GENERATION_IN_BACKGROUND', 'True').lower() in ('true', '1', 'yes')
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', '2'))
+# Jobs live only in the web process, so a recycle, crash or deploy loses them.
+# A reply still pending after this many seconds (well past the longest
+# provider timeout plus queueing) is marked failed when it is next polled.
+GENERATION_STALE_AFTER = int(os.getenv('GENERATION_STALE_AFTER', '600'))
+
+# Image providers are tried in priority order, falling back only once one has
+# failed. Setting IMAGE_HEDGE_DELAY to N > 0 opts in to hedging: if a provider
+# hasn't answered after N seconds the next is started alongside it and the
+# first to return images wins. That cuts tail latency, but a hedged request
+# can bill two providers for the same images, so it is off by default.
+IMAGE_HEDGE_DELAY = float(os.getenv('IMAGE_HEDGE_DELAY', '0'))
+
+# Product mockups reuse generated blank product photos instead of paying for
+# a new one each time. Each base prompt keeps a pool of this many photos,
+# picked at random for variety. A photo older than MOCKUP_BASE_TTL seconds
+# is regenerated the next time it is picked.
+MOCKUP_BASE_POOL_SIZE = int(os.getenv('MOCKUP_BASE_POOL_SIZE', '3'))
+MOCKUP_BASE_TTL = int(os.getenv('MOCKUP_BASE_TTL', str(7 * 24 * 3600)))
+
 
 
 # Cloudflare Workers AI (free img2img — no credit card needed)
@@ -119,6 +151,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections across requests instead of reopening per request
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -178,3 +213,26 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Every API call (including message polls) loads the session; serve it from
+# the cache and only fall back to the database on a miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+
+# Logging
+# The chat app logs provider progress at DEBUG; keep it at INFO in
+# production so those calls are skipped before any formatting happens.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'chat': {
+            'handlers': ['console'],
+            'level': os.getenv('CHAT_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO'),
+        },
+    },
+}